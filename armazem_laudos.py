@@ -0,0 +1,141 @@
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import streamlit as st
+
+from config import LIMITE_ARMAZEM_LAUDOS, PASTA_LAUDOS
+
+logger = logging.getLogger(__name__)
+
+EXTENSAO = ".docx"
+
+
+class ArmazemLaudos:
+    """Laudos gerados guardados em disco, endereçados pelo conteúdo (SHA-256).
+
+    A fila e as sessões guardam só a chave; o arquivo é lido do disco para o
+    upload e para o botão de download. O total em disco é limitado a
+    `limite_bytes`: ao passar do limite, os laudos usados há mais tempo são
+    apagados, exceto os retidos (`reter`) por envios ainda em andamento.
+    """
+
+    def __init__(self, pasta=PASTA_LAUDOS, limite_bytes=LIMITE_ARMAZEM_LAUDOS):
+        self.pasta = pasta
+        self.limite_bytes = limite_bytes
+        self._lock = threading.Lock()
+        self._retidos = {}
+        os.makedirs(pasta, exist_ok=True)
+        # Ordem de uso (mais antigo primeiro) reconstruída pela data de modificação
+        arquivos = []
+        for nome in os.listdir(pasta):
+            if nome.endswith(EXTENSAO):
+                info = os.stat(os.path.join(pasta, nome))
+                arquivos.append((info.st_mtime, nome[:-len(EXTENSAO)], info.st_size))
+            elif nome.endswith(".tmp"):
+                os.remove(os.path.join(pasta, nome))
+        self._tamanhos = OrderedDict((chave, tamanho) for _, chave, tamanho in sorted(arquivos))
+        self._total = sum(self._tamanhos.values())
+
+    def caminho(self, chave):
+        return os.path.join(self.pasta, chave + EXTENSAO)
+
+    @property
+    def total_bytes(self):
+        return self._total
+
+    def __contains__(self, chave):
+        with self._lock:
+            return chave in self._tamanhos
+
+    def guardar(self, conteudo, reter=False):
+        """Grava o laudo (bytes) e devolve a chave. Conteúdo repetido não ocupa espaço de novo.
+
+        Com `reter`, o laudo já entra retido (ver `reter`), sem intervalo em que
+        outra gravação possa descartá-lo.
+        """
+        chave = hashlib.sha256(conteudo).hexdigest()
+        caminho = self.caminho(chave)
+        with self._lock:
+            if chave in self._tamanhos:
+                self._tamanhos.move_to_end(chave)
+                os.utime(caminho)
+                if reter:
+                    self._reter(chave)
+                return chave
+        temporario = f"{caminho}.{threading.get_ident()}.tmp"
+        with open(temporario, "wb") as f:
+            f.write(conteudo)
+        os.replace(temporario, caminho)
+        with self._lock:
+            if chave not in self._tamanhos:
+                self._tamanhos[chave] = len(conteudo)
+                self._total += len(conteudo)
+            if reter:
+                self._reter(chave)
+            self._podar(manter=chave)
+        return chave
+
+    def abrir(self, chave):
+        """Arquivo aberto (rb) do laudo, ou None se já foi descartado."""
+        with self._lock:
+            if chave not in self._tamanhos:
+                return None
+            self._tamanhos.move_to_end(chave)
+            try:
+                os.utime(self.caminho(chave))
+                return open(self.caminho(chave), "rb")
+            except FileNotFoundError:
+                self._esquecer(chave)
+                return None
+
+    def ler(self, chave):
+        arquivo = self.abrir(chave)
+        if arquivo is None:
+            return None
+        with arquivo:
+            return arquivo.read()
+
+    def reter(self, chave):
+        """Impede que o laudo seja descartado até `liberar` (envio em andamento)."""
+        with self._lock:
+            self._reter(chave)
+
+    def _reter(self, chave):
+        self._retidos[chave] = self._retidos.get(chave, 0) + 1
+
+    def liberar(self, chave):
+        with self._lock:
+            restantes = self._retidos.get(chave, 0) - 1
+            if restantes > 0:
+                self._retidos[chave] = restantes
+            else:
+                self._retidos.pop(chave, None)
+            self._podar()
+
+    def _esquecer(self, chave):
+        self._total -= self._tamanhos.pop(chave, 0)
+
+    def _podar(self, manter=None):
+        if self._total <= self.limite_bytes:
+            return
+        for chave in list(self._tamanhos):
+            if self._total <= self.limite_bytes:
+                break
+            if chave == manter or chave in self._retidos:
+                continue
+            try:
+                os.remove(self.caminho(chave))
+            except FileNotFoundError:
+                pass
+            self._esquecer(chave)
+        if self._total > self.limite_bytes:
+            logger.warning("Armazém de laudos acima do limite (%d bytes retidos por envios em andamento)", self._total)
+
+
+@st.cache_resource(show_spinner=False)
+def obter_armazem():
+    """Armazém único por processo, compartilhado pela fila e pelas sessões."""
+    return ArmazemLaudos()
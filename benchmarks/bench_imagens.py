@@ -0,0 +1,75 @@
+"""Microbenchmark da normalização das fotos de evidência (imagens.normalizar_imagem).
+
+Mede fotos de celular típicas (JPEG 12 MP, JPEG girado pelo EXIF e PNG de
+captura de tela) e mostra o tamanho antes/depois.
+
+Uso (na raiz do repositório):
+    python benchmarks/bench_imagens.py --n 20
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image  # noqa: E402
+
+from imagens import formatar_tamanho, normalizar_imagem  # noqa: E402
+from medicao import adicionar_argumentos_baseline, comparar_baseline, encerrar, resumir, rss_pico_mb  # noqa: E402
+
+
+def _foto(largura, altura, formato, orientacao=None):
+    # Ruído sobre gradiente: comprime como foto de verdade, não como cor lisa
+    imagem = Image.merge("RGB", [
+        Image.linear_gradient("L").resize((largura, altura)),
+        Image.effect_noise((largura, altura), 40),
+        Image.linear_gradient("L").rotate(90).resize((largura, altura)),
+    ])
+    buffer = io.BytesIO()
+    if formato == "JPEG":
+        exif = Image.Exif()
+        if orientacao:
+            exif[0x0112] = orientacao
+        imagem.save(buffer, "JPEG", quality=92, exif=exif)
+    else:
+        imagem.save(buffer, formato)
+    return buffer.getvalue()
+
+
+CENARIOS = {
+    "jpeg_12mp": lambda: _foto(4000, 3000, "JPEG"),
+    "jpeg_12mp_girado": lambda: _foto(4000, 3000, "JPEG", orientacao=6),
+    "png_tela": lambda: _foto(1170, 2532, "PNG"),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n", type=int, default=20, help="fotos por cenário")
+    adicionar_argumentos_baseline(parser)
+    args = parser.parse_args()
+
+    metricas = {}
+    print(f"{'cenário':<18} {'p50 ms':>8} {'p95 ms':>8} {'original':>10} {'no laudo':>10}")
+    for nome, fabrica in CENARIOS.items():
+        original = fabrica()
+        normalizar_imagem(original)  # aquecimento
+        duracoes = []
+        for _ in range(args.n):
+            inicio = time.perf_counter()
+            resultado = normalizar_imagem(original)
+            duracoes.append(time.perf_counter() - inicio)
+        resumo = resumir(nome, duracoes)
+        metricas.update(resumo)
+        metricas[f"{nome}.fotos_por_s"] = args.n / sum(duracoes)
+        print(f"{nome:<18} {resumo[f'{nome}.p50_ms']:>8.1f} {resumo[f'{nome}.p95_ms']:>8.1f} "
+              f"{formatar_tamanho(len(original)):>10} {formatar_tamanho(len(resultado.conteudo)):>10}")
+    metricas["rss_pico_mb"] = rss_pico_mb()
+    print(f"pico de memória: {metricas['rss_pico_mb']:.0f} MB")
+    encerrar(comparar_baseline("imagens", {"n": args.n}, metricas, args.tolerancia, args.salvar_baseline))
+
+
+if __name__ == "__main__":
+    main()
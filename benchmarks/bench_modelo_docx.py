@@ -0,0 +1,66 @@
+"""Microbenchmark da geração do laudo: modelo relido a cada envio (frio) x ModeloDocx em cache (quente).
+
+Uso (na raiz do repositório):
+    python benchmarks/bench_modelo_docx.py --n 30
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docxtpl import DocxTemplate  # noqa: E402
+
+from config import NOME_ARQUIVO_MODELO  # noqa: E402
+from medicao import adicionar_argumentos_baseline, comparar_baseline, encerrar  # noqa: E402
+from modelo_docx import ModeloDocx  # noqa: E402
+
+
+def contexto_exemplo():
+    return {
+        "data_nc": "01/10/2025", "emitente": "Inspetor", "turno": "1º Turno", "area_id": "Pátio",
+        "nao_conf": "13 REBARBA EXCESSIVA", "cc_origem": "31211", "setor_origem": "PRENSAS",
+        "causa": "Ferramenta desgastada", "desc_item": "LONGARINA 2000", "cod_item": "123456",
+        "qtd_pecas": 10, "metragem": 20.0, "peso": 35.5, "fornecedor": " ", "cor_tinta": " ",
+        "cliente": "Cliente", "pedido": "P-1", "op": "OP-1", "acao": "Retrabalhar", "obs": "",
+        "ass_lider": "", "ass_coord": "", "ass_qual": "", "ass_refugo": "", "ass_gerente": "",
+        "n_nc": "", "foto": "",
+    }
+
+
+def renderizar(doc):
+    doc.render(contexto_exemplo())
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer
+
+
+def medir(nome, fabrica, n):
+    inicio = time.perf_counter()
+    for _ in range(n):
+        renderizar(fabrica())
+    duracao = time.perf_counter() - inicio
+    print(f"{nome:<6} {n:>5} laudos  {duracao:8.3f} s  {n / duracao:8.1f} laudos/s  {duracao / n * 1000:8.1f} ms/laudo")
+    return n / duracao
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n", type=int, default=30, help="laudos por cenário")
+    parser.add_argument("--modelo", default=NOME_ARQUIVO_MODELO)
+    adicionar_argumentos_baseline(parser)
+    args = parser.parse_args()
+
+    frio = medir("frio", lambda: DocxTemplate(args.modelo), args.n)
+    modelo = ModeloDocx(args.modelo)
+    modelo.novo_documento()  # aquecimento: carrega e pré-processa o modelo
+    quente = medir("quente", modelo.novo_documento, args.n)
+    print(f"ganho: {quente / frio:.1f}x")
+    metricas = {"frio_laudos_por_s": frio, "quente_laudos_por_s": quente}
+    encerrar(comparar_baseline("modelo_docx", {"n": args.n}, metricas, args.tolerancia, args.salvar_baseline))
+
+
+if __name__ == "__main__":
+    main()
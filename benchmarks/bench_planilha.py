@@ -0,0 +1,74 @@
+"""Microbenchmark da gravação na planilha contra um Sheets falso (benchmarks/google_falso.py).
+
+Compara uma chamada de append por linha com o lote único da caixa de saída
+(CaixaSaida.descarregar), com a latência por requisição configurável.
+
+Uso (na raiz do repositório):
+    python benchmarks/bench_planilha.py --linhas 200 --latencia 0.2
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from caixa_saida import CaixaSaida  # noqa: E402
+from conexao_google import anexar_linhas  # noqa: E402
+from google_falso import PoolLocal, SheetsFalso  # noqa: E402
+from medicao import adicionar_argumentos_baseline, comparar_baseline, encerrar, resumir  # noqa: E402
+from registro_rnc import CAMPOS, montar_linha  # noqa: E402
+
+
+def linha_exemplo(indice):
+    dados = {campo: f"{campo} {indice}" for campo in CAMPOS}
+    dados["data_nc"] = date.today().isoformat()
+    dados["n_nc"] = indice
+    return montar_linha(dados)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--linhas", type=int, default=200, help="linhas gravadas por cenário")
+    parser.add_argument("--latencia", type=float, default=0.2, help="latência por requisição no Sheets (s)")
+    adicionar_argumentos_baseline(parser)
+    args = parser.parse_args()
+
+    sheets = SheetsFalso(latencia=args.latencia).iniciar()
+    pool = PoolLocal(sheets=sheets)
+    pool.aba()  # abre a planilha antes de medir
+    linhas = [linha_exemplo(indice) for indice in range(args.linhas)]
+
+    sheets.contadores.clear()
+    duracoes = []
+    for linha in linhas:
+        inicio = time.perf_counter()
+        anexar_linhas([linha], pool=pool)
+        duracoes.append(time.perf_counter() - inicio)
+    por_linha = sum(duracoes)
+    print(f"{'um append por linha':<28} {por_linha:7.2f} s  {args.linhas / por_linha:8.1f} linhas/s  "
+          f"{dict(sorted(sheets.contadores.items()))}")
+
+    sheets.contadores.clear()
+    caixa = CaixaSaida(os.path.join(tempfile.mkdtemp(), "caixa.db"), intervalo_minimo=0, pool=pool)
+    for indice, linha in enumerate(linhas):
+        caixa.registrar(f"bench-{indice}", linha)
+    inicio = time.perf_counter()
+    while caixa.pendentes():
+        caixa.descarregar()
+    em_lote = time.perf_counter() - inicio
+    print(f"{'caixa de saída (lote)':<28} {em_lote:7.2f} s  {args.linhas / em_lote:8.1f} linhas/s  "
+          f"{dict(sorted(sheets.contadores.items()))}")
+    sheets.parar()
+
+    metricas = resumir("append_unitario", duracoes)
+    metricas["append_unitario_linhas_por_s"] = args.linhas / por_linha
+    metricas["lote_linhas_por_s"] = args.linhas / em_lote
+    parametros = {"linhas": args.linhas, "latencia": args.latencia}
+    encerrar(comparar_baseline("planilha", parametros, metricas, args.tolerancia, args.salvar_baseline))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Exercita e mede o upload_drive contra um Drive falso local (benchmarks/google_falso.py).
+
+Uso (na raiz do repositório):
+    python benchmarks/bench_upload_drive.py --latencia 0.05
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import upload_drive  # noqa: E402
+from google_falso import DriveFalso, PoolLocal  # noqa: E402
+
+KB = 1024
+MB = 1024 * KB
+
+
+def arquivo(tamanho):
+    return io.BytesIO(os.urandom(tamanho))
+
+
+def cenario(nome, drive, funcao):
+    drive.contadores.clear()
+    inicio = time.perf_counter()
+    resultado = funcao()
+    duracao = time.perf_counter() - inicio
+    print(f"{nome:<48} {duracao:7.3f} s  {dict(sorted(drive.contadores.items()))}")
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latencia", type=float, default=0.05, help="latência por requisição no Drive falso (s)")
+    parser.add_argument("--n", type=int, default=8, help="laudos no cenário de envio em paralelo")
+    args = parser.parse_args()
+
+    drive = DriveFalso(latencia=args.latencia).iniciar()
+    pool = PoolLocal(drive=drive)
+    sessoes = upload_drive.SessoesUpload(tempfile.mkdtemp())
+    opcoes = {"pool": pool, "sessoes": sessoes}
+
+    pequeno = arquivo(200 * KB)
+    cenario("200 KB multipart", drive, lambda: upload_drive.enviar_arquivo(pequeno, "a.docx", **opcoes))
+    cenario("200 KB retomável (limite_simples=0)", drive,
+            lambda: upload_drive.enviar_arquivo(pequeno, "a.docx", limite_simples=0, **opcoes))
+
+    grande = arquivo(12 * MB)
+    for chunk in (256 * KB, 1 * MB, 4 * MB):
+        cenario(f"12 MB retomável, partes de {chunk // KB} KB", drive,
+                lambda: upload_drive.enviar_arquivo(grande, "b.docx", tamanho_chunk=chunk, **opcoes))
+
+    # Queda no meio do upload sem novas tentativas (simula o processo caindo);
+    # a segunda chamada com a mesma chave continua de onde parou
+    drive.cortar_conexao_apos = 6 * MB
+    tentativas_originais, upload_drive.TENTATIVAS_CHUNK = upload_drive.TENTATIVAS_CHUNK, 0
+    try:
+        cenario("12 MB: conexão cai em 6 MB", drive,
+                lambda: upload_drive.enviar_arquivo(grande, "c.docx", chave="queda", **opcoes))
+    except Exception as e:
+        print(f"{'':<48} interrompido: {type(e).__name__}; sessão salva: {sessoes.obter('queda') is not None}")
+    finally:
+        upload_drive.TENTATIVAS_CHUNK = tentativas_originais
+    drive.cortar_conexao_apos = None
+    link = cenario("12 MB: retomada com a mesma chave", drive,
+                   lambda: upload_drive.enviar_arquivo(grande, "c.docx", chave="queda", **opcoes))
+    print(f"{'':<48} link: {link}")
+
+    for paralelismo in (1, 4):
+        itens = [(arquivo(200 * KB), f"rnc{i}.docx", None) for i in range(args.n)]
+        cenario(f"{args.n} x 200 KB, paralelismo {paralelismo}", drive,
+                lambda: upload_drive.enviar_varios(itens, paralelismo=paralelismo, **opcoes))
+
+    drive.parar()
+
+
+if __name__ == "__main__":
+    main()
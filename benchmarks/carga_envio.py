@@ -0,0 +1,166 @@
+"""Teste de carga do envio de RNCs contra Drive e Sheets falsos (benchmarks/google_falso.py).
+
+Simula N inspetores enviando o formulário ao mesmo tempo, pelo mesmo caminho
+do botão de envio (foto normalizada, número da RNC, FilaEnvio, CaixaSaida),
+e mede cada etapa:
+
+    imagem    normalização da foto (na sessão, antes de enfileirar)
+    espera    tempo na fila até um trabalhador pegar o envio
+    laudo     geração do .docx
+    upload    envio ao Drive
+    planilha  do registro na caixa de saída até a linha estar na planilha
+    total     do clique até laudo no Drive e linha na planilha
+
+Uso (na raiz do repositório):
+    python benchmarks/carga_envio.py --sessoes 8 --rncs 5
+    python benchmarks/carga_envio.py --sessoes 20 --latencia-drive 0.3 --taxa-erro 0.05
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image  # noqa: E402
+
+from armazem_laudos import ArmazemLaudos  # noqa: E402
+from caixa_saida import ENVIADO, REJEITADO, CaixaSaida  # noqa: E402
+from config import INTERVALO_MINIMO_SHEETS, TRABALHADORES_FILA  # noqa: E402
+from fila_envio import ERRO, FilaEnvio  # noqa: E402
+from google_falso import DriveFalso, PoolLocal, SheetsFalso  # noqa: E402
+from imagens import normalizar_imagem  # noqa: E402
+from medicao import (  # noqa: E402
+    adicionar_argumentos_baseline, comparar_baseline, encerrar, imprimir_etapas, resumir, rss_pico_mb,
+)
+from numeracao_rnc import NumeracaoRNC  # noqa: E402
+from registro_rnc import montar_contexto, montar_linha, nome_arquivo_rnc  # noqa: E402
+
+ETAPAS = ["imagem", "espera", "laudo", "upload", "planilha", "total"]
+INTERVALO_CONSULTA = 0.005
+
+
+def foto_exemplo(largura=4000, altura=3000):
+    """JPEG do tamanho de uma foto de celular (12 MP)."""
+    imagem = Image.linear_gradient("L").resize((largura, altura)).convert("RGB")
+    buffer = io.BytesIO()
+    imagem.save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def dados_exemplo(sessao, indice):
+    return {
+        "data_nc": date.today(), "emitente": f"Inspetor {sessao}", "turno": "1º Turno", "area_id": "Pátio",
+        "nao_conf": "13 REBARBA EXCESSIVA", "cc_origem": "11000", "setor_origem": "MONTAGEM",
+        "causa": "Ferramenta desgastada", "desc_item": "LONGARINA 2000", "cod_item": str(100000 + indice),
+        "qtd_pecas": 10, "metragem": 20.0, "peso": 35.5, "fornecedor": " ", "cor_tinta": " ",
+        "cliente": "Cliente", "pedido": f"P-{indice}", "op": f"OP-{sessao}-{indice}", "acao": "Retrabalhar",
+        "obs": "", "ass_lider": "", "ass_coord": "", "ass_qual": "", "ass_refugo": "", "ass_gerente": "",
+    }
+
+
+def sessao(numero, args, fila, numeracao, foto, amostras, falhas, lock):
+    for indice in range(args.rncs):
+        inicio = time.perf_counter()
+        fotos = [normalizar_imagem(foto) for _ in range(args.fotos)]
+        fim_imagem = time.perf_counter()
+
+        dados = dados_exemplo(numero, indice)
+        dados["n_nc"] = numeracao.proximo()
+        id_trabalho = fila.enviar(montar_contexto(dados), montar_linha(dados), nome_arquivo_rnc(dados), fotos)
+
+        na_planilha = None
+        while True:
+            trabalho = fila.status(id_trabalho)
+            estado_planilha = (fila.caixa.situacao(id_trabalho) or {}).get("estado")
+            if na_planilha is None and estado_planilha == ENVIADO:
+                na_planilha = time.perf_counter()
+            if trabalho.finalizado and (na_planilha or trabalho.estado == ERRO or estado_planilha == REJEITADO):
+                break
+            time.sleep(INTERVALO_CONSULTA)
+        fim = time.perf_counter()
+
+        with lock:
+            if trabalho.estado == ERRO or not trabalho.link:
+                falhas.append(trabalho.mensagem or "sem link do Drive")
+            elif na_planilha is None:
+                falhas.append("linha recusada pela planilha")
+            else:
+                tempos = trabalho.tempos
+                amostras["imagem"].append(fim_imagem - inicio)
+                amostras["espera"].append(tempos["espera"])
+                amostras["laudo"].append(tempos["laudo"])
+                amostras["upload"].append(tempos["upload"])
+                # A linha entra na caixa de saída antes do laudo
+                amostras["planilha"].append(na_planilha - fim_imagem - tempos["espera"])
+                amostras["total"].append(fim - inicio)
+        fila.descartar(id_trabalho)
+        if args.pausa:
+            time.sleep(args.pausa)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessoes", type=int, default=8, help="inspetores simultâneos")
+    parser.add_argument("--rncs", type=int, default=5, help="RNCs enviadas por sessão")
+    parser.add_argument("--fotos", type=int, default=1, help="fotos por RNC")
+    parser.add_argument("--pausa", type=float, default=0.0, help="pausa entre envios da mesma sessão (s)")
+    parser.add_argument("--trabalhadores", type=int, default=TRABALHADORES_FILA, help="trabalhadores da fila")
+    parser.add_argument("--latencia-drive", type=float, default=0.15, help="latência por requisição no Drive (s)")
+    parser.add_argument("--latencia-sheets", type=float, default=0.2, help="latência por requisição no Sheets (s)")
+    parser.add_argument("--taxa-erro", type=float, default=0.0, help="fração de requisições respondidas com 503")
+    parser.add_argument("--intervalo-sheets", type=float, default=INTERVALO_MINIMO_SHEETS,
+                        help="intervalo mínimo entre escritas na planilha (s)")
+    adicionar_argumentos_baseline(parser)
+    args = parser.parse_args()
+
+    drive = DriveFalso(latencia=args.latencia_drive, taxa_erro=args.taxa_erro).iniciar()
+    sheets = SheetsFalso(latencia=args.latencia_sheets, taxa_erro=args.taxa_erro).iniciar()
+    pool = PoolLocal(drive=drive, sheets=sheets)
+    pasta = tempfile.mkdtemp(prefix="rnc-carga-")
+    caixa = CaixaSaida(os.path.join(pasta, "caixa.db"), intervalo_minimo=args.intervalo_sheets, pool=pool).iniciar()
+    armazem = ArmazemLaudos(os.path.join(pasta, "laudos"))
+    fila = FilaEnvio(os.path.join(pasta, "fila"), trabalhadores=args.trabalhadores, caixa=caixa, pool=pool,
+                     armazem=armazem)
+    numeracao = NumeracaoRNC(os.path.join(pasta, "numeracao.db"))
+    foto = foto_exemplo()
+
+    amostras = {etapa: [] for etapa in ETAPAS}
+    falhas = []
+    lock = threading.Lock()
+    sessoes = [
+        threading.Thread(target=sessao, args=(numero, args, fila, numeracao, foto, amostras, falhas, lock))
+        for numero in range(args.sessoes)
+    ]
+    inicio = time.perf_counter()
+    for thread in sessoes:
+        thread.start()
+    for thread in sessoes:
+        thread.join()
+    duracao = time.perf_counter() - inicio
+    caixa.parar()
+    drive.parar()
+    sheets.parar()
+
+    concluidas = len(amostras["total"])
+    print(f"{args.sessoes} sessões x {args.rncs} RNCs: {concluidas} concluídas, {len(falhas)} falhas "
+          f"em {duracao:.1f} s ({concluidas / duracao:.2f} RNCs/s)")
+    imprimir_etapas(ETAPAS, amostras)
+    print(f"pico de memória: {rss_pico_mb():.0f} MB · Drive: {dict(sorted(drive.contadores.items()))}")
+    print(f"Sheets: {dict(sorted(sheets.contadores.items()))}")
+    for mensagem in sorted(set(falhas)):
+        print(f"  falha: {mensagem}", file=sys.stderr)
+
+    metricas = {"vazao_por_s": concluidas / duracao, "rss_pico_mb": rss_pico_mb()}
+    for etapa in ETAPAS:
+        metricas.update(resumir(etapa, amostras[etapa]))
+    parametros = {chave: valor for chave, valor in vars(args).items() if chave not in ("tolerancia", "salvar_baseline")}
+    encerrar(comparar_baseline("carga_envio", parametros, metricas, args.tolerancia, args.salvar_baseline))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,375 @@
+"""Servidores HTTP locais que imitam as APIs do Google usadas pelo app (Drive e Sheets).
+
+Servem para medir e exercitar o caminho de envio sem rede nem credenciais:
+latência, taxa de erro e quedas de conexão são configuráveis.
+"""
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+import gspread
+import requests
+from gspread.utils import a1_to_rowcol, column_letter_to_index, rowcol_to_a1
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.http import build_http
+
+
+class _ServidorFalso(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, handler, latencia=0.0, taxa_erro=0.0):
+        super().__init__(("127.0.0.1", 0), handler)
+        self.latencia = latencia
+        self.taxa_erro = taxa_erro
+        self.lock = threading.Lock()
+        self.contadores = {}
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/"
+
+    def contar(self, nome, quantidade=1):
+        with self.lock:
+            self.contadores[nome] = self.contadores.get(nome, 0) + quantidade
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self):
+        self.shutdown()
+        self.server_close()
+
+
+class _HandlerBase(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Cabeçalho e corpo saem em escritas separadas; sem isso o Nagle + ACK
+    # atrasado somam ~40 ms a cada resposta e distorcem as medições
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _ler_corpo(self):
+        tamanho = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(tamanho) if tamanho else b""
+
+    def _responder(self, status, corpo=None, cabecalhos=None):
+        dados = json.dumps(corpo).encode() if corpo is not None else b""
+        self.send_response(status)
+        for nome, valor in (cabecalhos or {}).items():
+            self.send_header(nome, valor)
+        if corpo is not None:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def _simular_rede(self):
+        """Aplica latência e, com probabilidade taxa_erro, responde 503. Devolve True se respondeu."""
+        servidor = self.server
+        if servidor.latencia:
+            time.sleep(servidor.latencia)
+        if servidor.taxa_erro and random.random() < servidor.taxa_erro:
+            self._ler_corpo()
+            servidor.contar("erros_injetados")
+            self._responder(503, {"error": {"code": 503, "message": "Backend Error", "status": "UNAVAILABLE"}})
+            return True
+        return False
+
+
+class _HandlerDrive(_HandlerBase):
+    def do_POST(self):
+        url = urlparse(self.path)
+        parametros = parse_qs(url.query)
+        tipo = parametros.get("uploadType", [""])[0]
+        if self._simular_rede():
+            return
+        corpo = self._ler_corpo()
+        servidor = self.server
+        if tipo == "multipart":
+            servidor.contar("multipart")
+            servidor.contar("bytes_recebidos", len(corpo))
+            self._responder(200, servidor.novo_arquivo(len(corpo)))
+        elif tipo == "resumable":
+            servidor.contar("sessoes_retomaveis")
+            id_sessao = uuid.uuid4().hex
+            total = int(self.headers.get("X-Upload-Content-Length") or -1)
+            with servidor.lock:
+                servidor.sessoes[id_sessao] = {"total": total, "recebido": 0}
+            local = f"{servidor.url}upload/drive/v3/files?uploadType=resumable&upload_id={id_sessao}"
+            self._responder(200, {}, {"Location": local})
+        else:
+            self._responder(400, {"error": {"code": 400, "message": f"uploadType inválido: {tipo}"}})
+
+    def do_PUT(self):
+        servidor = self.server
+        id_sessao = parse_qs(urlparse(self.path).query).get("upload_id", [""])[0]
+        sessao = servidor.sessoes.get(id_sessao)
+        if sessao is None:
+            self._ler_corpo()
+            self._responder(404, {"error": {"code": 404, "message": "Sessão de upload não encontrada"}})
+            return
+        intervalo = self.headers.get("Content-Range", "")
+        consulta = re.match(r"bytes \*/(\d+|\*)", intervalo)
+        if consulta:
+            servidor.contar("consultas_status")
+            self._ler_corpo()
+            self._responder_progresso(sessao)
+            return
+        if self._simular_rede():
+            return
+
+        parte = re.match(r"bytes (\d+)-(\d+)/(\d+|\*)", intervalo)
+        inicio = int(parte.group(1))
+        tamanho = int(self.headers.get("Content-Length") or 0)
+        limite = servidor.cortar_conexao_apos
+        if limite is not None and inicio + tamanho > limite:
+            # Simula queda de conexão: lê só até o limite e fecha sem responder
+            self.rfile.read(max(limite - inicio, 0))
+            with servidor.lock:
+                sessao["recebido"] = max(sessao["recebido"], limite)
+            servidor.contar("conexoes_cortadas")
+            self.close_connection = True
+            self.connection.shutdown(2)
+            return
+
+        dados = self.rfile.read(tamanho)
+        servidor.contar("partes")
+        servidor.contar("bytes_recebidos", len(dados))
+        with servidor.lock:
+            # O Drive aceita reenvio de bytes já recebidos; só conta o que avança
+            sessao["recebido"] = max(sessao["recebido"], inicio + len(dados))
+        if parte.group(3) != "*":
+            sessao["total"] = int(parte.group(3))
+        self._responder_progresso(sessao)
+
+    def _responder_progresso(self, sessao):
+        if sessao["total"] >= 0 and sessao["recebido"] >= sessao["total"]:
+            self._responder(200, self.server.novo_arquivo(sessao["total"]))
+        elif sessao["recebido"]:
+            self._responder(308, None, {"Range": f"bytes=0-{sessao['recebido'] - 1}"})
+        else:
+            self._responder(308)
+
+
+class DriveFalso(_ServidorFalso):
+    """Drive v3 mínimo: files.create com uploadType=multipart e resumable."""
+
+    def __init__(self, latencia=0.0, taxa_erro=0.0):
+        super().__init__(_HandlerDrive, latencia, taxa_erro)
+        self.sessoes = {}
+        self.arquivos = {}
+        # Se definido, qualquer parte que passe desse byte derruba a conexão
+        self.cortar_conexao_apos = None
+
+    def novo_arquivo(self, tamanho):
+        id_arquivo = uuid.uuid4().hex[:16]
+        with self.lock:
+            self.arquivos[id_arquivo] = tamanho
+        return {"id": id_arquivo, "webViewLink": f"{self.url}file/d/{id_arquivo}/view"}
+
+
+class _HandlerSheets(_HandlerBase):
+    # /v4/spreadsheets/<id>, /v4/spreadsheets/<id>/values/<intervalo>[:append], /v4/spreadsheets/<id>/values:batchUpdate
+    _ROTA = re.compile(r"^/v4/spreadsheets/([^/]+)(?:/values(?:/([^:]+))?(?::(\w+))?)?$")
+
+    def _rota(self):
+        url = urlparse(self.path)
+        encontrado = self._ROTA.match(url.path)
+        if not encontrado:
+            return None
+        _, intervalo, acao = encontrado.groups()
+        return (unquote(intervalo) if intervalo else None), acao, parse_qs(url.query)
+
+    def do_GET(self):
+        rota = self._rota()
+        if self._simular_rede():
+            return
+        if rota is None:
+            self._responder(404, {"error": {"code": 404, "message": "Não encontrado"}})
+            return
+        intervalo, _, parametros = rota
+        servidor = self.server
+        if intervalo is None:
+            servidor.contar("metadados")
+            self._responder(200, servidor.metadados())
+            return
+        servidor.contar("leituras")
+        colunas = parametros.get("majorDimension", ["ROWS"])[0] == "COLUMNS"
+        resposta = {"range": intervalo, "majorDimension": "COLUMNS" if colunas else "ROWS"}
+        valores = servidor.ler(intervalo, colunas)
+        if valores:
+            # Como a API real: intervalo vazio vem sem a chave "values"
+            resposta["values"] = valores
+        self._responder(200, resposta)
+
+    def do_POST(self):
+        rota = self._rota()
+        if self._simular_rede():
+            return
+        corpo = json.loads(self._ler_corpo() or b"{}")
+        servidor = self.server
+        if rota is not None and rota[1] == "append":
+            if any(len(str(valor)) > LIMITE_CELULA for linha in corpo.get("values", []) for valor in linha):
+                servidor.contar("appends_recusados")
+                self._responder(400, {"error": {
+                    "code": 400, "status": "INVALID_ARGUMENT",
+                    "message": f"Your input contains more than the maximum of {LIMITE_CELULA} characters in a single cell.",
+                }})
+                return
+            servidor.contar("appends")
+            servidor.contar("linhas_anexadas", len(corpo.get("values", [])))
+            intervalo = servidor.anexar(corpo.get("values", []))
+            if servidor.perder_resposta():
+                # Falha ambígua: as linhas foram gravadas, mas o cliente só vê o erro
+                self._responder(503, {"error": {"code": 503, "message": "Backend Error", "status": "UNAVAILABLE"}})
+                return
+            self._responder(200, {"updates": {"updatedRange": intervalo}})
+        elif rota is not None and rota[1] == "batchUpdate":
+            servidor.contar("batch_updates")
+            for item in corpo.get("data", []):
+                servidor.gravar(item["range"], item["values"])
+            self._responder(200, {"totalUpdatedCells": sum(len(item["values"]) for item in corpo.get("data", []))})
+        else:
+            self._responder(404, {"error": {"code": 404, "message": "Não encontrado"}})
+
+
+LIMITE_CELULA = 50000  # caracteres por célula, como no Sheets
+
+
+def _celula(texto):
+    """'AB12' -> (12, 28); 'AB' -> (None, 28)."""
+    if texto[-1].isdigit():
+        return a1_to_rowcol(texto)
+    return None, column_letter_to_index(texto)
+
+
+class SheetsFalso(_ServidorFalso):
+    """Sheets v4 mínimo para o gspread: metadados, leitura, append e batchUpdate de valores.
+
+    A aba é uma lista de linhas em memória; a linha 1 é o cabeçalho. Com
+    `respostas_perdidas`, os próximos appends são aplicados mas respondem 503.
+    """
+
+    ID_PLANILHA = "planilha-falsa"
+    TITULO_ABA = "RNC"
+
+    def __init__(self, latencia=0.0, taxa_erro=0.0, cabecalho=("Data",)):
+        super().__init__(_HandlerSheets, latencia, taxa_erro)
+        self.linhas = [list(cabecalho)]
+        self.respostas_perdidas = 0
+
+    def metadados(self):
+        with self.lock:
+            total = len(self.linhas)
+        return {
+            "spreadsheetId": self.ID_PLANILHA,
+            "properties": {"title": "Planilha falsa"},
+            "sheets": [{"properties": {
+                "sheetId": 0, "title": self.TITULO_ABA, "index": 0, "sheetType": "GRID",
+                "gridProperties": {"rowCount": max(total, 1000), "columnCount": 40},
+            }}],
+        }
+
+    def _intervalo(self, intervalo):
+        intervalo = intervalo.split("!")[-1]
+        inicio, _, fim = intervalo.partition(":")
+        linha_inicial, coluna_inicial = _celula(inicio)
+        linha_final, coluna_final = _celula(fim) if fim else (linha_inicial, coluna_inicial)
+        return linha_inicial or 1, coluna_inicial, linha_final, coluna_final
+
+    def ler(self, intervalo, colunas=False):
+        linha_inicial, coluna_inicial, linha_final, coluna_final = self._intervalo(intervalo)
+        with self.lock:
+            linhas = self.linhas[linha_inicial - 1:linha_final]
+            valores = [linha[coluna_inicial - 1:coluna_final] for linha in linhas]
+        if colunas:
+            valores = [[linha[i] if i < len(linha) else "" for linha in valores] for i in range(coluna_final - coluna_inicial + 1)]
+        # Como a API real: sem linhas/células vazias no fim
+        valores = [_sem_vazios_no_fim(linha) for linha in valores]
+        return _sem_vazios_no_fim(valores)
+
+    def perder_resposta(self):
+        with self.lock:
+            if self.respostas_perdidas <= 0:
+                return False
+            self.respostas_perdidas -= 1
+            return True
+
+    def anexar(self, valores):
+        with self.lock:
+            primeira = len(self.linhas) + 1
+            self.linhas.extend([str(valor) for valor in linha] for linha in valores)
+        ultima_coluna = max((len(linha) for linha in valores), default=1)
+        return f"{self.TITULO_ABA}!A{primeira}:{rowcol_to_a1(primeira + len(valores) - 1, ultima_coluna)}"
+
+    def gravar(self, intervalo, valores):
+        linha_inicial, coluna_inicial, _, _ = self._intervalo(intervalo)
+        with self.lock:
+            for deslocamento, linha_valores in enumerate(valores):
+                indice = linha_inicial - 1 + deslocamento
+                while len(self.linhas) <= indice:
+                    self.linhas.append([])
+                linha = self.linhas[indice]
+                fim = coluna_inicial - 1 + len(linha_valores)
+                linha.extend([""] * (fim - len(linha)))
+                linha[coluna_inicial - 1:fim] = [str(valor) for valor in linha_valores]
+
+
+def _sem_vazios_no_fim(valores):
+    fim = len(valores)
+    while fim and valores[fim - 1] in ("", []):
+        fim -= 1
+    return valores[:fim]
+
+
+class _SessaoRedirecionada(requests.Session):
+    """Sessão do gspread que troca o endereço do Google pelo do servidor falso."""
+
+    def __init__(self, base):
+        super().__init__()
+        self._base = base
+
+    def request(self, method, url, *args, **kwargs):
+        url = url.replace("https://sheets.googleapis.com/", self._base)
+        return super().request(method, url, *args, **kwargs)
+
+
+class PoolLocal:
+    """Substituto do conexao_google.PoolGoogle apontando para os servidores falsos."""
+
+    def __init__(self, drive=None, sheets=None):
+        self.drive = drive
+        self.sheets = sheets
+        self._lock = threading.Lock()
+        self._aba = None
+        self._local = threading.local()
+        documento = json.loads(get_static_doc("drive", "v3"))
+        if drive is not None:
+            documento["rootUrl"] = drive.url
+            documento["baseUrl"] = f"{drive.url}drive/v3/"
+        self._documento_drive = documento
+
+    def aba(self):
+        with self._lock:
+            if self._aba is None:
+                cliente = gspread.Client(None, session=_SessaoRedirecionada(self.sheets.url))
+                self._aba = cliente.open_by_key(SheetsFalso.ID_PLANILHA).sheet1
+            return self._aba
+
+    def servico_drive(self):
+        if not hasattr(self._local, "drive"):
+            self._local.drive = build_from_document(self._documento_drive, http=build_http())
+        return self._local.drive
+
+    def executar(self, operacao, tentativas=2):
+        return operacao(self)
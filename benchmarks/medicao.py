@@ -0,0 +1,104 @@
+"""Estatística, memória e baselines compartilhados pelos benchmarks.
+
+Cada benchmark produz um dicionário plano de métricas ("laudo.p95_ms": 41.2,
+"vazao_por_s": 3.1, ...). Métricas terminadas em "_por_s" são melhores quando
+maiores; as demais (tempos, memória) quando menores. A primeira execução grava
+o baseline em benchmarks/baselines/<nome>.json; as seguintes comparam com ele.
+"""
+import json
+import math
+import os
+import resource
+import sys
+
+PASTA_BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+
+def percentil(valores, p):
+    """Percentil pelo método do posto mais próximo (p em 0-100)."""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    posto = max(math.ceil(p / 100 * len(ordenados)), 1)
+    return ordenados[posto - 1]
+
+
+def resumir(nome, segundos):
+    """Métricas p50/p95/p99 em ms de uma lista de durações em segundos."""
+    return {
+        f"{nome}.p50_ms": percentil(segundos, 50) * 1000,
+        f"{nome}.p95_ms": percentil(segundos, 95) * 1000,
+        f"{nome}.p99_ms": percentil(segundos, 99) * 1000,
+    }
+
+
+def rss_pico_mb():
+    """Pico de memória residente do processo (ru_maxrss é KB no Linux e bytes no macOS)."""
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / (1024 * 1024) if sys.platform == "darwin" else pico / 1024
+
+
+def imprimir_etapas(etapas, amostras):
+    """Tabela p50/p95/p99 por etapa; `amostras` é {etapa: [segundos, ...]}."""
+    print(f"{'etapa':<10} {'n':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'máx ms':>9}")
+    for etapa in etapas:
+        valores = amostras.get(etapa, [])
+        print(f"{etapa:<10} {len(valores):>5} {percentil(valores, 50) * 1000:>9.1f} "
+              f"{percentil(valores, 95) * 1000:>9.1f} {percentil(valores, 99) * 1000:>9.1f} "
+              f"{max(valores, default=0.0) * 1000:>9.1f}")
+
+
+def _caminho_baseline(nome):
+    return os.path.join(PASTA_BASELINES, f"{nome}.json")
+
+
+def salvar_baseline(nome, parametros, metricas):
+    os.makedirs(PASTA_BASELINES, exist_ok=True)
+    with open(_caminho_baseline(nome), "w", encoding="utf-8") as f:
+        json.dump({"parametros": parametros, "metricas": metricas}, f, ensure_ascii=False, indent=2)
+
+
+def comparar_baseline(nome, parametros, metricas, tolerancia=0.2, salvar=False):
+    """Compara com o baseline salvo e devolve a lista de regressões (texto).
+
+    Sem baseline (ou com `salvar`), grava as métricas atuais como baseline.
+    Baseline medido com outros parâmetros não é comparado.
+    """
+    caminho = _caminho_baseline(nome)
+    if salvar or not os.path.exists(caminho):
+        salvar_baseline(nome, parametros, metricas)
+        print(f"baseline gravado em {os.path.relpath(caminho)}")
+        return []
+    with open(caminho, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline["parametros"] != parametros:
+        print(f"baseline em {os.path.relpath(caminho)} usa outros parâmetros; comparação ignorada "
+              "(use --salvar-baseline para substituí-lo)")
+        return []
+
+    regressoes = []
+    print(f"\n{'métrica':<30} {'baseline':>10} {'atual':>10} {'variação':>9}")
+    for metrica, atual in metricas.items():
+        anterior = baseline["metricas"].get(metrica)
+        if anterior is None:
+            continue
+        variacao = (atual - anterior) / anterior if anterior else 0.0
+        pior = -variacao if metrica.endswith("_por_s") else variacao
+        marca = " <- regressão" if pior > tolerancia else ""
+        print(f"{metrica:<30} {anterior:>10.1f} {atual:>10.1f} {variacao:>+8.0%}{marca}")
+        if marca:
+            regressoes.append(f"{metrica}: {anterior:.1f} -> {atual:.1f} ({variacao:+.0%})")
+    return regressoes
+
+
+def adicionar_argumentos_baseline(parser):
+    parser.add_argument("--tolerancia", type=float, default=0.2,
+                        help="piora relativa aceita antes de acusar regressão (padrão: 0.2 = 20%%)")
+    parser.add_argument("--salvar-baseline", action="store_true", help="grava esta execução como novo baseline")
+
+
+def encerrar(regressoes):
+    """Sai com código 1 se houve regressão (para uso em CI)."""
+    if regressoes:
+        print(f"\n{len(regressoes)} regressão(ões) acima da tolerância", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,333 @@
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+import streamlit as st
+
+from config import (
+    ARQUIVO_CAIXA_SAIDA, COLUNA_CHAVE, COLUNA_LINK, INTERVALO_MINIMO_SHEETS, LOTE_MAXIMO_SHEETS,
+)
+from conexao_google import anexar_linhas, atualizar_celulas, erro_transitorio, ler_coluna
+from metricas import classificar_erro
+
+logger = logging.getLogger(__name__)
+
+PENDENTE = "pendente"
+ENVIANDO = "enviando"
+ENVIADO = "enviado"
+REJEITADO = "rejeitado"  # recusada pela planilha (ex.: célula acima do limite); não é mais reenviada
+
+RESERVA_SEGUNDOS = 300  # envio "enviando" mais antigo que isso é considerado abandonado
+ESPERA_MAXIMA = 300
+TENTATIVAS_RECUSA = 3  # recusas (400) da mesma linha antes de marcá-la como rejeitada
+TENTATIVAS_LINK = 5  # ciclos procurando a linha na planilha antes de desistir do link
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS linhas (
+    chave TEXT PRIMARY KEY,
+    dados TEXT NOT NULL,
+    criado_em REAL NOT NULL,
+    estado TEXT NOT NULL DEFAULT 'pendente',
+    reservado_ate REAL,
+    verificar INTEGER NOT NULL DEFAULT 0,
+    linha_planilha INTEGER,
+    link_pendente TEXT,
+    tentativas INTEGER NOT NULL DEFAULT 0,
+    tentativas_link INTEGER NOT NULL DEFAULT 0,
+    ultimo_erro TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_linhas_estado ON linhas (estado, criado_em);
+"""
+
+
+class CaixaSaida:
+    """Caixa de saída durável das linhas da planilha.
+
+    Toda linha é gravada primeiro no SQLite local (modo WAL) com uma chave de
+    idempotência; um único descarregador junta as pendentes em um `append_rows`,
+    respeitando a cota de escrita e com backoff exponencial em 429/5xx. A chave
+    vai para a coluna COLUNA_CHAVE: depois de uma falha ambígua (a chamada pode
+    ter sido aplicada) a coluna é consultada antes de reenviar, para não duplicar.
+    Se a planilha recusar o lote (400), ele é dividido até isolar as linhas
+    inválidas, que vão para REJEITADO sem travar as demais.
+    """
+
+    def __init__(self, caminho=ARQUIVO_CAIXA_SAIDA, lote=LOTE_MAXIMO_SHEETS, intervalo_minimo=INTERVALO_MINIMO_SHEETS,
+                 pool=None):
+        self.caminho = caminho
+        self.pool = pool
+        self.lote = lote
+        self.intervalo_minimo = intervalo_minimo
+        self._sinal = threading.Event()
+        self._parar = threading.Event()
+        self._thread = None
+        self._ultima_escrita = 0.0
+        self._lock_envio = threading.Lock()
+        with closing(self._conectar()) as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.executescript(_ESQUEMA)
+            # Caixas criadas antes da contagem de tentativas do link
+            colunas = {registro[1] for registro in con.execute("PRAGMA table_info(linhas)")}
+            if "tentativas_link" not in colunas:
+                con.execute("ALTER TABLE linhas ADD COLUMN tentativas_link INTEGER NOT NULL DEFAULT 0")
+
+    def _conectar(self):
+        con = sqlite3.connect(self.caminho, timeout=30, isolation_level=None)
+        con.execute("PRAGMA synchronous=NORMAL")
+        return con
+
+    # --- Entrada -------------------------------------------------------------
+
+    def registrar(self, chave, linha):
+        """Grava a linha para envio. Registrar a mesma chave de novo não tem efeito."""
+        dados = [str(item) if item is not None else "" for item in linha]
+        # Completa até o link; o que vier depois (número da RNC) segue após a chave
+        dados = dados + [""] * (COLUNA_LINK - len(dados))
+        with closing(self._conectar()) as con:
+            con.execute(
+                "INSERT OR IGNORE INTO linhas (chave, dados, criado_em) VALUES (?, ?, ?)",
+                (chave, json.dumps(dados, ensure_ascii=False), time.time())
+            )
+        self._sinal.set()
+
+    def atualizar_link(self, chave, link):
+        """Define o link do Drive da linha, esteja ela ainda na caixa ou já na planilha."""
+        with closing(self._conectar()) as con:
+            con.execute("BEGIN IMMEDIATE")
+            registro = con.execute("SELECT dados, estado FROM linhas WHERE chave = ?", (chave,)).fetchone()
+            if registro is None:
+                con.execute("ROLLBACK")
+                return
+            dados, estado = registro
+            if estado == PENDENTE:
+                dados = json.loads(dados)
+                dados[COLUNA_LINK - 1] = link
+                con.execute("UPDATE linhas SET dados = ? WHERE chave = ?", (json.dumps(dados, ensure_ascii=False), chave))
+            else:
+                con.execute("UPDATE linhas SET link_pendente = ? WHERE chave = ?", (link, chave))
+            con.execute("COMMIT")
+        self._sinal.set()
+
+    def situacao(self, chave):
+        with closing(self._conectar()) as con:
+            registro = con.execute(
+                "SELECT estado, linha_planilha, link_pendente, tentativas, ultimo_erro FROM linhas WHERE chave = ?",
+                (chave,)
+            ).fetchone()
+        if registro is None:
+            return None
+        return dict(zip(("estado", "linha_planilha", "link_pendente", "tentativas", "ultimo_erro"), registro))
+
+    def pendentes(self):
+        """Linhas (ou links) ainda por enviar; as rejeitadas não contam."""
+        with closing(self._conectar()) as con:
+            return con.execute(
+                "SELECT COUNT(*) FROM linhas WHERE estado IN (?, ?) OR (estado = ? AND link_pendente IS NOT NULL)",
+                (PENDENTE, ENVIANDO, ENVIADO)
+            ).fetchone()[0]
+
+    # --- Envio ---------------------------------------------------------------
+
+    def _respeitar_cota(self):
+        espera = self._ultima_escrita + self.intervalo_minimo - time.monotonic()
+        if espera > 0:
+            time.sleep(espera)
+        self._ultima_escrita = time.monotonic()
+
+    def _reservar_lote(self):
+        agora = time.time()
+        with closing(self._conectar()) as con:
+            con.execute("BEGIN IMMEDIATE")
+            registros = con.execute(
+                "SELECT chave, dados, verificar, estado FROM linhas "
+                "WHERE estado = ? OR (estado = ? AND reservado_ate < ?) ORDER BY criado_em LIMIT ?",
+                (PENDENTE, ENVIANDO, agora, self.lote)
+            ).fetchall()
+            con.executemany(
+                "UPDATE linhas SET estado = ?, reservado_ate = ? WHERE chave = ?",
+                [(ENVIANDO, agora + RESERVA_SEGUNDOS, chave) for chave, *_ in registros]
+            )
+            con.execute("COMMIT")
+        # Reserva abandonada (processo caiu no meio do envio) também precisa de verificação
+        return [
+            (chave, json.loads(dados), bool(verificar) or estado == ENVIANDO)
+            for chave, dados, verificar, estado in registros
+        ]
+
+    def _chaves_na_planilha(self):
+        self._respeitar_cota()
+        coluna = ler_coluna(COLUNA_CHAVE, pool=self.pool)
+        return {chave: numero for numero, chave in enumerate(coluna, start=1) if chave}
+
+    def _marcar_enviadas(self, linhas_planilha):
+        with closing(self._conectar()) as con:
+            con.executemany(
+                "UPDATE linhas SET estado = ?, reservado_ate = NULL, verificar = 0, linha_planilha = ?, ultimo_erro = NULL "
+                "WHERE chave = ?",
+                [(ENVIADO, numero, chave) for chave, numero in linhas_planilha.items()]
+            )
+
+    def _devolver(self, chaves, erro):
+        # Limite de taxa (429 ou 403 rateLimitExceeded) é rejeição explícita; nos demais casos a escrita pode ter sido aplicada
+        verificar = 0 if classificar_erro(erro) == "limite_taxa" else 1
+        with closing(self._conectar()) as con:
+            con.executemany(
+                "UPDATE linhas SET estado = ?, reservado_ate = NULL, verificar = MAX(verificar, ?), "
+                "tentativas = tentativas + 1, ultimo_erro = ? WHERE chave = ?",
+                [(PENDENTE, verificar, str(erro)[:500], chave) for chave in chaves]
+            )
+
+    def _recusar(self, recusadas):
+        """Linhas recusadas isoladamente: voltam a pendente até TENTATIVAS_RECUSA e então são rejeitadas."""
+        if not recusadas:
+            return
+        with closing(self._conectar()) as con:
+            con.executemany(
+                "UPDATE linhas SET estado = CASE WHEN tentativas + 1 >= ? THEN ? ELSE ? END, reservado_ate = NULL, "
+                "verificar = 0, tentativas = tentativas + 1, ultimo_erro = ? WHERE chave = ?",
+                [(TENTATIVAS_RECUSA, REJEITADO, PENDENTE, str(erro)[:500], chave) for chave, erro in recusadas.items()]
+            )
+        for chave, erro in recusadas.items():
+            logger.error("Planilha recusou a linha %s: %s", chave, erro)
+
+    def _anexar(self, novas, linhas_planilha, recusadas):
+        """Anexa `novas` em uma chamada; se a planilha recusar o conteúdo, divide o lote ao
+        meio até isolar as linhas recusadas. Erros transitórios e de acesso sobem."""
+        if not novas:
+            return
+        self._respeitar_cota()
+        try:
+            primeira = anexar_linhas([
+                dados[:COLUNA_LINK] + [chave] + dados[COLUNA_LINK:] for chave, dados in novas
+            ], pool=self.pool)
+        except Exception as e:
+            if erro_transitorio(e) or getattr(e, "code", None) != 400:
+                raise
+            if len(novas) == 1:
+                recusadas[novas[0][0]] = e
+                return
+            meio = len(novas) // 2
+            self._anexar(novas[:meio], linhas_planilha, recusadas)
+            self._anexar(novas[meio:], linhas_planilha, recusadas)
+            return
+        for deslocamento, (chave, _) in enumerate(novas):
+            linhas_planilha[chave] = primeira + deslocamento if primeira else None
+
+    def _enviar_linhas(self):
+        lote = self._reservar_lote()
+        if not lote:
+            return 0
+        chaves = [chave for chave, _, _ in lote]
+        linhas_planilha, recusadas, novas = {}, {}, []
+        try:
+            if any(verificar for _, _, verificar in lote):
+                existentes = self._chaves_na_planilha()
+                linhas_planilha = {chave: existentes[chave] for chave in chaves if chave in existentes}
+
+            novas = [(chave, dados) for chave, dados, _ in lote if chave not in linhas_planilha]
+            self._anexar(novas, linhas_planilha, recusadas)
+        except Exception as e:
+            # Partes do lote já anexadas antes da falha continuam marcadas como enviadas
+            self._devolver([chave for chave in chaves if chave not in linhas_planilha and chave not in recusadas], e)
+            raise
+        finally:
+            self._marcar_enviadas(linhas_planilha)
+            self._recusar(recusadas)
+        return len(novas)
+
+    def _enviar_links(self):
+        with closing(self._conectar()) as con:
+            registros = con.execute(
+                "SELECT chave, linha_planilha, link_pendente FROM linhas WHERE estado = ? AND link_pendente IS NOT NULL",
+                (ENVIADO,)
+            ).fetchall()
+        if not registros:
+            return 0
+        if any(numero is None for _, numero, _ in registros):
+            existentes = self._chaves_na_planilha()
+            registros = [(chave, numero or existentes.get(chave), link) for chave, numero, link in registros]
+        self._sem_linha([chave for chave, numero, _ in registros if not numero])
+        registros = [registro for registro in registros if registro[1]]
+        if not registros:
+            return 0
+        self._respeitar_cota()
+        atualizar_celulas({(numero, COLUNA_LINK): link for _, numero, link in registros}, pool=self.pool)
+        with closing(self._conectar()) as con:
+            # Só limpa se o link não mudou enquanto a atualização estava em andamento
+            con.executemany(
+                "UPDATE linhas SET link_pendente = NULL, linha_planilha = ? WHERE chave = ? AND link_pendente = ?",
+                [(numero, chave, link) for chave, numero, link in registros]
+            )
+        return len(registros)
+
+    def _sem_linha(self, chaves):
+        """Links cuja chave não está mais na planilha (linha apagada ou movida à mão).
+
+        Depois de TENTATIVAS_LINK ciclos o link é abandonado, para não reler a
+        coluna de chaves a cada ciclo para sempre.
+        """
+        if not chaves:
+            return
+        with closing(self._conectar()) as con:
+            con.executemany(
+                "UPDATE linhas SET tentativas_link = tentativas_link + 1, ultimo_erro = ? WHERE chave = ?",
+                [("Linha não encontrada na planilha para gravar o link", chave) for chave in chaves]
+            )
+            abandonados = con.execute(
+                "SELECT chave, link_pendente FROM linhas WHERE tentativas_link >= ? "
+                f"AND chave IN ({','.join('?' * len(chaves))})",
+                (TENTATIVAS_LINK, *chaves)
+            ).fetchall()
+            con.executemany("UPDATE linhas SET link_pendente = NULL WHERE chave = ?", [(chave,) for chave, _ in abandonados])
+        for chave, link in abandonados:
+            logger.error("Linha %s não encontrada na planilha; link do Drive não gravado: %s", chave, link)
+
+    def descarregar(self):
+        """Um ciclo de envio: linhas pendentes em lote e depois os links atrasados.
+
+        Levanta a exceção da API em falhas transitórias ou de acesso; as linhas voltam
+        a pendente. Linhas recusadas (400) são isoladas e não interrompem o ciclo.
+        """
+        with self._lock_envio:
+            enviadas = self._enviar_linhas()
+            self._enviar_links()
+            return enviadas
+
+    # --- Descarregador em segundo plano --------------------------------------
+
+    def iniciar(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._laco, name="rnc-caixa-saida", daemon=True)
+            self._thread.start()
+        return self
+
+    def parar(self):
+        self._parar.set()
+        self._sinal.set()
+
+    def _laco(self):
+        espera = 0
+        while not self._parar.is_set():
+            if espera:
+                self._parar.wait(espera)
+            else:
+                self._sinal.wait(timeout=30)
+            self._sinal.clear()
+            try:
+                while self.descarregar() >= self.lote:
+                    pass
+                espera = 0
+            except Exception as e:
+                espera = min(max(espera * 2, 2), ESPERA_MAXIMA) * random.uniform(0.8, 1.2)
+                nivel = logging.WARNING if erro_transitorio(e) else logging.ERROR
+                logger.log(nivel, "Falha ao enviar linhas para a planilha (nova tentativa em %.0f s): %s", espera, e)
+
+
+@st.cache_resource(show_spinner=False)
+def obter_caixa_saida():
+    """Caixa de saída única por processo; o descarregador é iniciado junto."""
+    return CaixaSaida().iniciar()
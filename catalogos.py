@@ -0,0 +1,110 @@
+"""Listas de opções do formulário de RNC (também usadas na validação da importação em lote).
+
+As listas ficam em ARQUIVO_CATALOGOS (JSON versionado junto do app): mudar uma
+opção não exige alterar código. O arquivo é lido uma vez por processo;
+`recarregar_catalogos()` relê sob demanda.
+"""
+import json
+import re
+import threading
+
+from config import ARQUIVO_CATALOGOS
+
+# "60 TINTA CONTAMINADA" -> código "60"; opções sem número têm o próprio texto como código
+_CODIGO = re.compile(r"^(\d+)\s")
+
+
+class Catalogo:
+    """Uma lista de opções, na ordem do formulário, com índices código <-> rótulo."""
+
+    def __init__(self, nome, opcoes):
+        self.nome = nome
+        self.opcoes = list(opcoes)
+        self._rotulos = set(self.opcoes)
+        self._por_codigo = {}
+        self._por_rotulo = {}
+        for rotulo in self.opcoes:
+            if not rotulo.strip():
+                continue
+            encontrado = _CODIGO.match(rotulo)
+            codigo = encontrado.group(1) if encontrado else rotulo
+            self._por_codigo.setdefault(codigo, rotulo)
+            self._por_rotulo[rotulo] = codigo
+
+    def __contains__(self, rotulo):
+        return rotulo in self._rotulos
+
+    def __iter__(self):
+        return iter(self.opcoes)
+
+    def __len__(self):
+        return len(self.opcoes)
+
+    def __getitem__(self, indice):
+        return self.opcoes[indice]
+
+    @property
+    def vazio(self):
+        """Opção em branco do início da lista, se houver (None caso contrário)."""
+        return self.opcoes[0] if self.opcoes and not self.opcoes[0].strip() else None
+
+    def rotulo(self, codigo):
+        return self._por_codigo.get(str(codigo).strip())
+
+    def codigo(self, rotulo):
+        return self._por_rotulo.get(rotulo)
+
+    def resolver(self, valor):
+        """Rótulo de `valor`, aceitando o rótulo exato, o código ou o rótulo sem diferença de caixa."""
+        if valor in self._rotulos:
+            return valor
+        texto = str(valor).strip()
+        if texto in self._rotulos:
+            return texto
+        if texto in self._por_codigo:
+            return self._por_codigo[texto]
+        return next((rotulo for rotulo in self.opcoes if rotulo.casefold() == texto.casefold()), None)
+
+
+class Catalogos:
+    def __init__(self, versao, listas):
+        self.versao = versao
+        self._listas = {nome: Catalogo(nome, opcoes) for nome, opcoes in listas.items()}
+
+    def __getitem__(self, nome):
+        return self._listas[nome]
+
+    def __iter__(self):
+        return iter(self._listas)
+
+    def items(self):
+        return self._listas.items()
+
+    @classmethod
+    def carregar(cls, caminho=ARQUIVO_CATALOGOS):
+        with open(caminho, encoding="utf-8") as f:
+            dados = json.load(f)
+        return cls(str(dados.get("versao", "")), dados["catalogos"])
+
+
+_lock = threading.Lock()
+_atual = None
+
+
+def obter_catalogos():
+    """Catálogos do processo, lidos do arquivo na primeira chamada."""
+    global _atual
+    if _atual is None:
+        with _lock:
+            if _atual is None:
+                _atual = Catalogos.carregar()
+    return _atual
+
+
+def recarregar_catalogos():
+    """Relê o arquivo; se ele estiver inválido, mantém os catálogos em uso e propaga o erro."""
+    global _atual
+    novos = Catalogos.carregar()
+    with _lock:
+        _atual = novos
+    return novos
@@ -0,0 +1,157 @@
+import re
+import threading
+
+import gspread
+import streamlit as st
+from google.auth.transport.requests import Request
+from google.oauth2.service_account import Credentials
+from googleapiclient.discovery import build
+
+from config import NOME_DA_PLANILHA, SCOPES
+from metricas import classificar_erro, contar, medir
+
+MIME_DOCX = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+
+
+# Derivados de metricas.classificar_erro, para que as métricas e as novas tentativas concordem
+ERROS_TRANSITORIOS = {"limite_taxa", "servidor", "rede"}
+
+
+def erro_de_autenticacao(erro):
+    """Indica se o erro veio de token expirado/revogado (vale reconectar)."""
+    return classificar_erro(erro) == "autenticacao"
+
+
+def erro_transitorio(erro):
+    """Indica se vale repetir a chamada mais tarde (limite de taxa, 5xx ou falha de rede)."""
+    return classificar_erro(erro) in ERROS_TRANSITORIOS
+
+
+class PoolGoogle:
+    """Conexões com o Google compartilhadas por todas as sessões do processo.
+
+    Mantém uma única credencial (com refresh do token), um cliente gspread,
+    a planilha/aba de NOME_DA_PLANILHA já abertas e um serviço do Drive por
+    thread (o httplib2 usado pelo googleapiclient não é thread-safe).
+    """
+
+    def __init__(self, info_credenciais, scopes=SCOPES, nome_planilha=NOME_DA_PLANILHA):
+        self._info_credenciais = dict(info_credenciais)
+        self._scopes = list(scopes)
+        self._nome_planilha = nome_planilha
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._geracao = 0
+        self._credenciais = None
+        self._cliente = None
+        self._planilha = None
+        self._aba = None
+
+    def credenciais(self):
+        with self._lock:
+            if self._credenciais is None:
+                self._credenciais = Credentials.from_service_account_info(
+                    self._info_credenciais,
+                    scopes=self._scopes
+                )
+            # Renova o token uma vez aqui, sob o lock, em vez de cada thread
+            # renovar por conta própria na próxima chamada
+            if not self._credenciais.valid:
+                with medir("autenticacao"):
+                    self._credenciais.refresh(Request())
+            return self._credenciais
+
+    def cliente_sheets(self):
+        with self._lock:
+            if self._cliente is None:
+                self._cliente = gspread.authorize(self.credenciais())
+            return self._cliente
+
+    def planilha(self):
+        with self._lock:
+            if self._planilha is None:
+                with medir("planilha_abertura"):
+                    self._planilha = self.cliente_sheets().open(self._nome_planilha)
+            return self._planilha
+
+    def aba(self):
+        with self._lock:
+            if self._aba is None:
+                self._aba = self.planilha().sheet1
+            return self._aba
+
+    def servico_drive(self):
+        local = self._local
+        if getattr(local, "geracao", None) != self._geracao:
+            local.servico = build('drive', 'v3', credentials=self.credenciais(), cache_discovery=False)
+            local.geracao = self._geracao
+        return local.servico
+
+    def invalidar(self):
+        """Descarta credencial, cliente e handles; a próxima chamada reconecta."""
+        with self._lock:
+            self._geracao += 1
+            self._credenciais = None
+            self._cliente = None
+            self._planilha = None
+            self._aba = None
+
+    def executar(self, operacao, tentativas=2):
+        """Executa `operacao(pool)` reconectando automaticamente em erro de autenticação."""
+        for tentativa in range(tentativas):
+            try:
+                return operacao(self)
+            except Exception as e:
+                if not erro_de_autenticacao(e) or tentativa == tentativas - 1:
+                    raise
+                self.invalidar()
+
+
+@st.cache_resource(show_spinner=False)
+def obter_pool():
+    """Pool único por processo, reaproveitado entre reruns e sessões."""
+    return PoolGoogle(st.secrets["gsheets"])
+
+
+def descrever_erro_drive(erro):
+    # Tratamento de erro específico para cota (pelo motivo estruturado da resposta, não pelo texto)
+    tipo = classificar_erro(erro)
+    if tipo == "cota":
+        return "❌ ERRO DE COTA: O Robô não tem espaço. Use uma pasta dentro de um 'Drive Compartilhado' (Shared Drive) e não no 'Meu Drive'."
+    if tipo == "limite_taxa":
+        return f"❌ Limite de requisições do Google Drive excedido: {erro}"
+    if tipo == "autenticacao":
+        return f"❌ Falha de autenticação no Google Drive: {erro}"
+    if tipo == "rede":
+        return f"❌ Sem conexão com o Google Drive: {erro}"
+    return f"❌ Erro no Google Drive: {erro}"
+
+
+def anexar_linhas(linhas, pool=None):
+    """Acrescenta as linhas na aba do RNC em uma única chamada e devolve o número
+    da primeira linha gravada (ou None se a resposta não trouxer o intervalo)."""
+    pool = pool or obter_pool()
+    linhas_str = [[str(item) if item is not None else "" for item in linha] for linha in linhas]
+    with medir("planilha_append", linhas=len(linhas_str)):
+        resposta = pool.executar(lambda pool: pool.aba().append_rows(linhas_str))
+    contar("rnc_planilha_linhas_total", len(linhas_str))
+    intervalo = (resposta or {}).get("updates", {}).get("updatedRange", "")
+    encontrado = re.search(r"![A-Z]+(\d+)", intervalo)
+    return int(encontrado.group(1)) if encontrado else None
+
+
+def atualizar_celulas(valores, pool=None):
+    """Grava vários {(linha, coluna): valor} em uma única chamada batch_update."""
+    pool = pool or obter_pool()
+    dados = [
+        {"range": gspread.utils.rowcol_to_a1(linha, coluna), "values": [[valor]]}
+        for (linha, coluna), valor in valores.items()
+    ]
+    with medir("planilha_atualizacao", celulas=len(dados)):
+        pool.executar(lambda pool: pool.aba().batch_update(dados))
+
+
+def ler_coluna(coluna, pool=None):
+    pool = pool or obter_pool()
+    with medir("planilha_leitura", coluna=coluna):
+        return pool.executar(lambda pool: pool.aba().col_values(coluna))
@@ -0,0 +1,66 @@
+import os
+
+# --- CONFIGURAÇÕES INICIAIS ---
+NOME_DA_PLANILHA = "RNCs - Qualidade Industrial"
+NOME_ARQUIVO_MODELO = "Modelo - Registro de Não Conformidade.docx"
+
+# ⚠️ CERTIFIQUE-SE DE QUE O ID ESTÁ CORRETO
+ID_PASTA_DRIVE = "0AGUUHFUnBEXtUk9PVA"
+
+SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive"
+]
+
+# Pasta local onde os envios aguardam processamento em segundo plano
+PASTA_FILA = ".rnc_fila"
+TRABALHADORES_FILA = 4
+TENTATIVAS_FILA = 6  # tentativas de um envio que falhou antes de esperar o próximo reinício
+ESPERA_INICIAL_FILA = 5  # segundos antes da 1ª nova tentativa; dobra a cada falha
+TTL_TRABALHOS = 3600  # segundos que um envio finalizado fica na memória para a tela de status
+
+# Caixa de saída local (SQLite) das linhas que vão para a planilha
+ARQUIVO_CAIXA_SAIDA = ".rnc_caixa_saida.db"
+LOTE_MAXIMO_SHEETS = 500
+INTERVALO_MINIMO_SHEETS = 1.5  # segundos entre escritas (cota de 60 escritas/min)
+
+# Layout da planilha (colunas numeradas a partir de 1)
+COLUNA_LINK = 27
+COLUNA_CHAVE = 28
+COLUNA_NUMERO = 29  # número sequencial da RNC
+
+# Fotos de evidência: redimensionadas para a largura impressa no laudo
+LARGURA_FOTO_MM = 100
+DPI_FOTO = 200
+QUALIDADE_JPEG = 80
+
+# Upload para o Drive: multipart simples até o limite, acima disso upload retomável em partes
+LIMITE_UPLOAD_SIMPLES = 5 * 1024 * 1024
+TAMANHO_CHUNK_UPLOAD = 4 * 256 * 1024  # múltiplo de 256 KB, exigência da API
+PARALELISMO_UPLOAD = 4
+PASTA_SESSOES_UPLOAD = os.path.join(PASTA_FILA, "uploads")
+
+# Réplica local da planilha (SQLite + FTS5) para consulta e histórico
+ARQUIVO_REPLICA = ".rnc_replica.db"
+LINHA_INICIAL_DADOS = 2  # linha 1 é o cabeçalho
+INTERVALO_SINCRONIA = 60  # segundos
+
+# Indicadores (Pareto/tendência): cache colunar das RNCs da réplica
+ARQUIVO_INDICADORES = ".rnc_indicadores.parquet"
+TTL_INDICADORES = 300  # segundos até buscar linhas novas na réplica
+
+# Numeração sequencial das RNCs (SQLite local, conferida com a planilha ao iniciar)
+ARQUIVO_NUMERACAO = ".rnc_numeracao.db"
+
+# Listas de opções do formulário (não conformidades, centros de custo, ...)
+ARQUIVO_CATALOGOS = "catalogos.json"
+
+# Métricas no formato do Prometheus em http://127.0.0.1:<porta>/metrics (None desativa)
+PORTA_METRICAS = 9464
+# Nível do log estruturado das etapas ("rnc.metricas", uma linha JSON por etapa); WARNING silencia
+NIVEL_LOG_METRICAS = os.environ.get("RNC_LOG_METRICAS", "INFO")
+
+# Laudos gerados guardados em disco (endereçados pelo conteúdo) para upload e download;
+# acima do limite, os menos usados recentemente são apagados
+PASTA_LAUDOS = ".rnc_laudos"
+LIMITE_ARMAZEM_LAUDOS = int(os.environ.get("RNC_LIMITE_LAUDOS_MB", "500")) * 1024 * 1024
@@ -0,0 +1,279 @@
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+
+import streamlit as st
+
+from armazem_laudos import obter_armazem
+from config import (
+    ESPERA_INICIAL_FILA, PARALELISMO_UPLOAD, PASTA_FILA, TENTATIVAS_FILA, TRABALHADORES_FILA, TTL_TRABALHOS,
+)
+from caixa_saida import obter_caixa_saida
+from conexao_google import descrever_erro_drive
+from metricas import observar
+from modelo_docx import renderizar_laudo
+from registro_rnc import LINK_ERRO
+from upload_drive import enviar_arquivo
+
+PENDENTE = "pendente"
+PROCESSANDO = "processando"
+CONCLUIDO = "concluido"
+ERRO = "erro"
+
+ESPERA_MAXIMA = 600
+
+
+@dataclass
+class TrabalhoRNC:
+    id: str
+    contexto: dict
+    linha: list
+    nome_arquivo: str
+    estado: str = PENDENTE
+    etapa: str = "Na fila"
+    mensagem: str = ""
+    link: str = ""
+    num_fotos: int = 0
+    bytes_fotos_originais: int = 0
+    bytes_fotos: int = 0
+    bytes_fotos_economizados: int = 0
+    criado_em: str = field(default_factory=lambda: datetime.now().strftime("%d/%m/%Y %H:%M:%S"))
+    # Duração de cada etapa em segundos (espera na fila, laudo, upload)
+    tempos: dict = field(default_factory=dict)
+    # Chave do laudo gerado no armazém em disco (armazem_laudos); nada fica em memória
+    laudo: str = ""
+    tamanho_laudo: int = 0
+    tentativas: int = 0
+    finalizado_em: float = 0.0  # time.time() da conclusão (ou da desistência)
+
+    @property
+    def finalizado(self):
+        return self.estado in (CONCLUIDO, ERRO)
+
+
+class FilaEnvio:
+    """Processa os envios do formulário em segundo plano.
+
+    Cada envio é gravado em PASTA_FILA antes de entrar na fila, então um
+    reinício do app retoma o que ficou pendente. A linha vai primeiro para a
+    caixa de saída da planilha, sem esperar o laudo nem o Drive; o laudo é
+    gerado pelo trabalhador e guardado no armazém em disco, de onde saem o
+    upload e o download, e fica retido até o upload terminar. A coluna do link
+    é preenchida quando o upload termina.
+    """
+
+    def __init__(self, pasta=PASTA_FILA, trabalhadores=TRABALHADORES_FILA, caixa=None, pool=None, armazem=None):
+        self.pasta = pasta
+        self.caixa = caixa or obter_caixa_saida()
+        self.armazem = armazem or obter_armazem()
+        self.pool = pool
+        os.makedirs(pasta, exist_ok=True)
+        self._trabalhos = {}
+        self._lock = threading.Lock()
+        self._lock_salvar = threading.Lock()
+        # Upload de cada trabalho ainda em andamento: uma nova tentativa espera por ele em vez de enviar de novo
+        self._uploads_em_andamento = {}
+        self._executor = ThreadPoolExecutor(max_workers=trabalhadores, thread_name_prefix="rnc-fila")
+        # Uploads em um pool separado: o trabalhador espera por eles e não pode ocupar a mesma vaga
+        self._uploads = ThreadPoolExecutor(max_workers=PARALELISMO_UPLOAD, thread_name_prefix="rnc-upload")
+        self._recuperar()
+
+    def _caminho(self, id_trabalho, extensao):
+        return os.path.join(self.pasta, f"{id_trabalho}.{extensao}")
+
+    def _salvar(self, trabalho):
+        # O trabalhador e o upload do mesmo trabalho gravam o mesmo arquivo
+        with self._lock_salvar:
+            dados = asdict(trabalho)
+            temporario = self._caminho(trabalho.id, "json.tmp")
+            with open(temporario, "w", encoding="utf-8") as f:
+                json.dump(dados, f, ensure_ascii=False)
+            os.replace(temporario, self._caminho(trabalho.id, "json"))
+
+    def _descartar_arquivos(self, trabalho):
+        extensoes = ["json"] + [f"img{i}" for i in range(trabalho.num_fotos)]
+        for extensao in extensoes:
+            try:
+                os.remove(self._caminho(trabalho.id, extensao))
+            except FileNotFoundError:
+                pass
+
+    def _podar(self):
+        """Esquece envios finalizados há mais de TTL_TRABALHOS (sessões fechadas sem "Novo Registro")."""
+        limite = time.time() - TTL_TRABALHOS
+        with self._lock:
+            for id_trabalho in [
+                id_trabalho for id_trabalho, trabalho in self._trabalhos.items()
+                if trabalho.finalizado and trabalho.finalizado_em < limite
+            ]:
+                del self._trabalhos[id_trabalho]
+
+    def _recuperar(self):
+        for nome in sorted(os.listdir(self.pasta)):
+            if not nome.endswith(".json"):
+                continue
+            with open(os.path.join(self.pasta, nome), encoding="utf-8") as f:
+                trabalho = TrabalhoRNC(**json.load(f))
+            trabalho.estado, trabalho.etapa, trabalho.tentativas = PENDENTE, "Retomado após reinício", 0
+            if trabalho.laudo:
+                self.armazem.reter(trabalho.laudo)
+            self._agendar(trabalho)
+
+    def _agendar(self, trabalho):
+        self._podar()
+        with self._lock:
+            self._trabalhos[trabalho.id] = trabalho
+        self._executor.submit(self._processar, trabalho, time.perf_counter())
+
+    def _tentar_de_novo(self, trabalho):
+        # Não passa pelo dicionário: a sessão pode ter descartado o trabalho enquanto ele esperava
+        self._executor.submit(self._processar, trabalho, time.perf_counter())
+
+    def enviar(self, contexto, linha, nome_arquivo, fotos=()):
+        """Grava o envio localmente, coloca na fila e devolve o id do trabalho.
+
+        `fotos` são ImagemNormalizada (ver imagens.normalizar_imagem).
+        """
+        trabalho = TrabalhoRNC(
+            id=uuid.uuid4().hex[:12],
+            contexto=dict(contexto),
+            linha=[str(item) if item is not None else "" for item in linha],
+            nome_arquivo=nome_arquivo,
+            num_fotos=len(fotos),
+            bytes_fotos_originais=sum(foto.bytes_originais for foto in fotos),
+            bytes_fotos=sum(len(foto.conteudo) for foto in fotos),
+            bytes_fotos_economizados=sum(foto.bytes_economizados for foto in fotos),
+        )
+        try:
+            for indice, foto in enumerate(fotos):
+                with open(self._caminho(trabalho.id, f"img{indice}"), "wb") as f:
+                    f.write(foto.conteudo)
+            self._salvar(trabalho)
+        except Exception:
+            # Disco cheio, por exemplo: não deixa fotos órfãs em PASTA_FILA
+            self._descartar_arquivos(trabalho)
+            raise
+        self._agendar(trabalho)
+        return trabalho.id
+
+    def status(self, id_trabalho):
+        with self._lock:
+            return self._trabalhos.get(id_trabalho)
+
+    def descartar(self, id_trabalho):
+        """Esquece um trabalho finalizado; o laudo continua no armazém até ser descartado por LRU."""
+        with self._lock:
+            trabalho = self._trabalhos.get(id_trabalho)
+            if trabalho and trabalho.finalizado:
+                del self._trabalhos[id_trabalho]
+
+    def _ler_fotos(self, trabalho):
+        fotos = []
+        for indice in range(trabalho.num_fotos):
+            with open(self._caminho(trabalho.id, f"img{indice}"), "rb") as f:
+                fotos.append(f.read())
+        return fotos
+
+    def _gerar_laudo(self, trabalho):
+        # Laudo já gerado antes de um reinício é reaproveitado: os mesmos bytes
+        # permitem retomar um upload retomável interrompido
+        if trabalho.laudo and trabalho.laudo in self.armazem:
+            return
+        buffer = renderizar_laudo(dict(trabalho.contexto), self._ler_fotos(trabalho))
+        conteudo = buffer.getvalue()
+        buffer.close()
+        if trabalho.laudo:
+            self.armazem.liberar(trabalho.laudo)
+        trabalho.laudo, trabalho.tamanho_laudo = self.armazem.guardar(conteudo, reter=True), len(conteudo)
+        self._salvar(trabalho)
+
+    def _enviar_ao_drive(self, trabalho):
+        inicio = time.perf_counter()
+        try:
+            arquivo = self.armazem.abrir(trabalho.laudo)
+            if arquivo is None:
+                # Laudo retido não é descartado pelo armazém; só some se apagado por fora: gera de novo
+                self._gerar_laudo(trabalho)
+                arquivo = self.armazem.abrir(trabalho.laudo)
+            if arquivo is None:
+                raise FileNotFoundError(f"laudo {trabalho.laudo} não está no armazém local ({self.armazem.pasta})")
+            with arquivo:
+                link = enviar_arquivo(arquivo, trabalho.nome_arquivo, chave=trabalho.id, pool=self.pool)
+        finally:
+            trabalho.tempos["upload"] = time.perf_counter() - inicio
+        # Gravado na hora: se uma etapa seguinte falhar, a nova tentativa não envia o laudo de novo
+        trabalho.link = link or ""
+        self._salvar(trabalho)
+        return trabalho.link
+
+    def _upload(self, trabalho):
+        """Future do upload do trabalho, reaproveitando um ainda em andamento."""
+        with self._lock:
+            upload = self._uploads_em_andamento.get(trabalho.id)
+            if upload is None or upload.done():
+                upload = self._uploads.submit(self._enviar_ao_drive, trabalho)
+                self._uploads_em_andamento[trabalho.id] = upload
+        return upload
+
+    def _processar(self, trabalho, agendado_em):
+        trabalho.estado, trabalho.mensagem = PROCESSANDO, ""
+        inicio = time.perf_counter()
+        trabalho.tempos["espera"] = inicio - agendado_em
+        observar("rnc_etapa_segundos", trabalho.tempos["espera"], etapa="fila_espera")
+        try:
+            # A linha não depende do laudo: entra na caixa de saída antes, e o laudo e o
+            # upload só preenchem o link. O id do trabalho é a chave de idempotência:
+            # retomar após reinício (ou nova tentativa) não duplica a linha
+            trabalho.etapa = "Gravando na planilha"
+            self.caixa.registrar(trabalho.id, trabalho.linha)
+
+            # Nova tentativa depois de um upload já concluído só falta gravar o link
+            if not trabalho.link:
+                trabalho.etapa = "Gerando laudo"
+                inicio_laudo = time.perf_counter()
+                self._gerar_laudo(trabalho)
+                trabalho.tempos["laudo"] = time.perf_counter() - inicio_laudo
+                upload = self._upload(trabalho)
+
+                trabalho.etapa = "Enviando ao Drive"
+                try:
+                    upload.result()
+                except FileNotFoundError as e:
+                    trabalho.mensagem = f"❌ Laudo indisponível para o upload: {e}"
+                except Exception as e:
+                    trabalho.mensagem = descrever_erro_drive(e)
+            self.caixa.atualizar_link(trabalho.id, trabalho.link or LINK_ERRO)
+
+            trabalho.estado, trabalho.etapa, trabalho.finalizado_em = CONCLUIDO, "Concluído", time.time()
+            with self._lock:
+                self._uploads_em_andamento.pop(trabalho.id, None)
+            self._descartar_arquivos(trabalho)
+            self.armazem.liberar(trabalho.laudo)
+        except Exception as e:
+            # Falha passageira (ex.: SQLite ocupado): nova tentativa com backoff
+            trabalho.mensagem = f"{trabalho.etapa}: {e}"
+            trabalho.tentativas += 1
+            if trabalho.tentativas < TENTATIVAS_FILA:
+                espera = min(ESPERA_INICIAL_FILA * 2 ** (trabalho.tentativas - 1), ESPERA_MAXIMA) * random.uniform(0.8, 1.2)
+                trabalho.estado, trabalho.etapa = PENDENTE, f"Falhou; nova tentativa em {espera:.0f} s"
+                temporizador = threading.Timer(espera, self._tentar_de_novo, (trabalho,))
+                temporizador.daemon = True
+                temporizador.start()
+            else:
+                # Continua gravado em PASTA_FILA e é retomado no próximo reinício
+                trabalho.estado, trabalho.finalizado_em = ERRO, time.time()
+                with self._lock:
+                    self._uploads_em_andamento.pop(trabalho.id, None)
+            self._salvar(trabalho)
+
+
+@st.cache_resource(show_spinner=False)
+def obter_fila():
+    """Fila única por processo, compartilhada por todas as sessões."""
+    return FilaEnvio()
@@ -0,0 +1,71 @@
+import io
+from dataclasses import dataclass
+
+from PIL import Image, ImageOps
+
+from config import DPI_FOTO, LARGURA_FOTO_MM, QUALIDADE_JPEG
+from metricas import LIMITES_BYTES, medir, observar
+
+
+@dataclass
+class ImagemNormalizada:
+    conteudo: bytes
+    largura: int
+    altura: int
+    bytes_originais: int
+
+    @property
+    def bytes_economizados(self):
+        return max(self.bytes_originais - len(self.conteudo), 0)
+
+
+def largura_alvo_px(largura_mm=LARGURA_FOTO_MM, dpi=DPI_FOTO):
+    return round(largura_mm / 25.4 * dpi)
+
+
+def normalizar_imagem(origem, largura_mm=LARGURA_FOTO_MM, dpi=DPI_FOTO, qualidade=QUALIDADE_JPEG):
+    """Prepara uma foto de evidência para o laudo.
+
+    `origem` pode ser bytes ou um arquivo (ex.: o UploadedFile do Streamlit, lido
+    sem copiar para um novo buffer). A foto é decodificada uma vez, já reduzida
+    pelo decodificador JPEG quando possível, girada conforme o EXIF, reduzida
+    para a largura impressa em `dpi` e regravada como JPEG progressivo sem
+    metadados.
+    """
+    if isinstance(origem, (bytes, bytearray)):
+        bytes_originais = len(origem)
+        origem = io.BytesIO(origem)
+    else:
+        origem.seek(0, io.SEEK_END)
+        bytes_originais = origem.tell()
+        origem.seek(0)
+
+    alvo = largura_alvo_px(largura_mm, dpi)
+    with medir("imagem", bytes_originais=bytes_originais), Image.open(origem) as imagem:
+        # Para JPEG, decodifica direto em 1/2, 1/4 ou 1/8 da resolução (o EXIF
+        # pode trocar largura e altura, por isso o alvo vale para os dois lados)
+        imagem.draft("RGB", (alvo, alvo))
+        imagem = ImageOps.exif_transpose(imagem)
+        if imagem.mode in ("RGBA", "LA", "P"):
+            imagem = imagem.convert("RGBA")
+            fundo = Image.new("RGB", imagem.size, "white")
+            fundo.paste(imagem, mask=imagem.getchannel("A"))
+            imagem = fundo
+        elif imagem.mode != "RGB":
+            imagem = imagem.convert("RGB")
+        if imagem.width > alvo:
+            imagem = imagem.resize((alvo, round(imagem.height * alvo / imagem.width)), Image.LANCZOS)
+
+        saida = io.BytesIO()
+        # Sem exif=...: o JPEG regravado não leva metadados (GPS, aparelho etc.)
+        imagem.save(saida, "JPEG", quality=qualidade, optimize=True, progressive=True, dpi=(dpi, dpi))
+    observar("rnc_imagem_bytes", bytes_originais, LIMITES_BYTES, versao="original")
+    observar("rnc_imagem_bytes", saida.tell(), LIMITES_BYTES, versao="laudo")
+    return ImagemNormalizada(saida.getvalue(), imagem.width, imagem.height, bytes_originais)
+
+
+def formatar_tamanho(num_bytes):
+    for unidade in ("B", "KB", "MB"):
+        if num_bytes < 1024 or unidade == "MB":
+            return f"{num_bytes:.0f} {unidade}" if unidade == "B" else f"{num_bytes:.1f} {unidade}"
+        num_bytes /= 1024
@@ -0,0 +1,281 @@
+"""Importação em lote de RNCs a partir de CSV ou XLSX, sem passar pelo formulário.
+
+As colunas têm os mesmos nomes dos campos do formulário (data_nc, emitente,
+turno, ..., ass_gerente) e, opcionalmente, `fotos` com caminhos de imagens
+separados por ";" (relativos ao arquivo importado).
+
+Uso:
+    python importar_rncs.py auditoria.xlsx
+    python importar_rncs.py auditoria.csv --validar
+    python importar_rncs.py auditoria.csv --somente-gerar --pasta-saida laudos/
+
+O progresso fica em <arquivo>.progresso.jsonl: rodar de novo continua da
+primeira linha ainda não enviada, sem duplicar linhas na planilha.
+"""
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from caixa_saida import CaixaSaida
+from config import PARALELISMO_UPLOAD
+from imagens import normalizar_imagem
+from modelo_docx import ModeloDocx, renderizar_laudo
+from numeracao_rnc import NumeracaoRNC
+from registro_rnc import LINK_ERRO, converter_registro, montar_contexto, montar_linha, nome_arquivo_rnc
+from upload_drive import enviar_varios
+
+_modelo = None
+
+
+class _DialetoPadrao(csv.excel):
+    # Separador do Excel em português; usado quando o Sniffer não decide
+    delimiter = ";"
+
+
+def _iniciar_processo():
+    # Cada processo carrega e pré-processa o modelo uma única vez
+    global _modelo
+    _modelo = ModeloDocx()
+
+
+def _renderizar(item):
+    numero, contexto, caminhos_fotos = item
+    fotos = []
+    for caminho in caminhos_fotos:
+        with open(caminho, "rb") as f:
+            fotos.append(normalizar_imagem(f).conteudo)
+    return numero, renderizar_laudo(contexto, fotos, modelo=_modelo).getvalue()
+
+
+def ler_registros(caminho):
+    """Devolve [(número da linha no arquivo, {coluna: valor}), ...]."""
+    if caminho.lower().endswith((".xlsx", ".xlsm")):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise SystemExit("Para importar XLSX instale o openpyxl (pip install openpyxl) ou exporte para CSV.")
+        planilha = load_workbook(caminho, read_only=True, data_only=True).worksheets[0]
+        linhas = planilha.iter_rows(values_only=True)
+        cabecalho = [str(coluna or "").strip().lower() for coluna in next(linhas)]
+        return [
+            (numero, dict(zip(cabecalho, valores)))
+            for numero, valores in enumerate(linhas, start=2)
+            if any(valor not in (None, "") for valor in valores)
+        ]
+
+    with open(caminho, encoding="utf-8-sig", newline="") as f:
+        amostra = f.read(4096)
+        f.seek(0)
+        try:
+            dialeto = csv.Sniffer().sniff(amostra, delimiters=";,\t")
+        except csv.Error:
+            # Arquivo de uma coluna só ou amostra ambígua
+            dialeto = _DialetoPadrao
+        leitor = csv.DictReader(f, dialect=dialeto)
+        leitor.fieldnames = [coluna.strip().lower() for coluna in leitor.fieldnames]
+        return [
+            (numero, registro)
+            for numero, registro in enumerate(leitor, start=2)
+            if any((valor or "").strip() for valor in registro.values() if isinstance(valor, str))
+        ]
+
+
+def carregar_progresso(caminho):
+    feitos = {}
+    if os.path.exists(caminho):
+        with open(caminho, encoding="utf-8") as f:
+            for linha in f:
+                if linha.strip():
+                    item = json.loads(linha)
+                    feitos[item["linha"]] = item
+    return feitos
+
+
+def _blocos(itens, tamanho):
+    for inicio in range(0, len(itens), tamanho):
+        yield itens[inicio:inicio + tamanho]
+
+
+def _taxa(quantidade, segundos):
+    return quantidade / segundos if segundos > 0 else 0.0
+
+
+def importar(caminho, processos=None, paralelismo=PARALELISMO_UPLOAD, lote=50,
+             validar_apenas=False, somente_gerar=False, pasta_saida=None):
+    inicio = time.perf_counter()
+    registros = ler_registros(caminho)
+    pasta_base = os.path.dirname(os.path.abspath(caminho))
+
+    validos, invalidos = [], 0
+    for numero, bruto in registros:
+        dados, erros = converter_registro(bruto)
+        fotos = [
+            os.path.join(pasta_base, foto.strip())
+            for foto in str(bruto.get("fotos") or "").split(";") if foto.strip()
+        ]
+        erros += [f"foto não encontrada: {os.path.relpath(foto, pasta_base)}" for foto in fotos if not os.path.isfile(foto)]
+        if erros:
+            invalidos += 1
+            print(f"linha {numero}: " + "; ".join(erros), file=sys.stderr)
+            continue
+        validos.append((numero, dados, fotos))
+    print(f"{len(registros)} linhas lidas: {len(validos)} válidas, {invalidos} com erro")
+    if validar_apenas or not validos:
+        return
+
+    caminho_progresso = caminho + ".progresso.jsonl"
+    feitos = {} if somente_gerar else carregar_progresso(caminho_progresso)
+    pendentes = [item for item in validos if item[0] not in feitos]
+    if feitos:
+        print(f"retomando: {len(validos) - len(pendentes)} linhas já enviadas em execução anterior")
+    if pasta_saida:
+        os.makedirs(pasta_saida, exist_ok=True)
+
+    # A chave identifica arquivo + linha: é a chave de idempotência da caixa de
+    # saída e a da sessão de upload retomável
+    prefixo = hashlib.sha1(os.path.abspath(caminho).encode()).hexdigest()[:10]
+    caixa = None if somente_gerar else CaixaSaida()
+    # Laudos só gerados localmente não consomem números da sequência
+    numeracao = None if somente_gerar else NumeracaoRNC()
+    if numeracao is not None:
+        try:
+            numeracao.reconciliar_planilha()
+        except Exception as e:
+            print(f"numeração não conferida com a planilha ({e}); seguindo com a sequência local", file=sys.stderr)
+    if not pendentes:
+        print("nada a importar: todas as linhas válidas já foram enviadas")
+        if caixa is not None:
+            _esvaziar_caixa(caixa)
+        return
+    processos = processos or os.cpu_count()
+    tempo_render = tempo_upload = 0.0
+    concluidos = erros_upload = erros_laudo = 0
+
+    with ProcessPoolExecutor(max_workers=processos, initializer=_iniciar_processo) as executor, \
+            open(os.devnull if somente_gerar else caminho_progresso, "a", encoding="utf-8") as progresso:
+        blocos = list(_blocos(pendentes, lote))
+
+        def agendar(bloco):
+            if numeracao is not None:
+                # A mesma linha do arquivo mantém o número ao retomar uma importação interrompida
+                numeros_rnc = numeracao.atribuir([f"{prefixo}-{numero}" for numero, _, _ in bloco])
+                for numero, dados, _ in bloco:
+                    dados["n_nc"] = numeros_rnc[f"{prefixo}-{numero}"]
+            itens = [(numero, montar_contexto(dados), fotos) for numero, dados, fotos in bloco]
+            return time.perf_counter(), [executor.submit(_renderizar, item) for item in itens]
+
+        # Um bloco sempre renderizando à frente enquanto o anterior é enviado
+        proximo = agendar(blocos[0])
+        for indice, bloco in enumerate(blocos):
+            inicio_render, futuros = proximo
+            laudos = {}
+            for (numero, _, _), futuro in zip(bloco, futuros):
+                try:
+                    laudos[numero] = futuro.result()[1]
+                except Exception as e:
+                    # Foto ilegível ou erro no modelo: a linha fica fora do progresso e entra na próxima execução
+                    print(f"linha {numero}: erro ao gerar o laudo: {e}", file=sys.stderr)
+                    erros_laudo += 1
+            tempo_render += time.perf_counter() - inicio_render
+            if indice + 1 < len(blocos):
+                proximo = agendar(blocos[indice + 1])
+            bloco = [item for item in bloco if item[0] in laudos]
+            if not bloco:
+                continue
+
+            nomes = {numero: nome_arquivo_rnc(dados) for numero, dados, _ in bloco}
+            if pasta_saida:
+                for numero, conteudo in laudos.items():
+                    # Algumas não conformidades têm "/" no texto (ex.: "RISCO / AMASSADA")
+                    nome_local = f"linha {numero} - {nomes[numero]}".replace("/", "-")
+                    with open(os.path.join(pasta_saida, nome_local), "wb") as f:
+                        f.write(conteudo)
+
+            if not somente_gerar:
+                inicio_upload = time.perf_counter()
+                links = enviar_varios(
+                    [(io.BytesIO(laudos[numero]), nomes[numero], f"{prefixo}-{numero}") for numero, _, _ in bloco],
+                    paralelismo=paralelismo,
+                )
+                tempo_upload += time.perf_counter() - inicio_upload
+
+                for (numero, dados, _), link in zip(bloco, links):
+                    chave = f"{prefixo}-{numero}"
+                    if isinstance(link, Exception):
+                        # A linha vai para a planilha com o link de erro, mas fica fora do
+                        # progresso: a próxima execução envia o laudo de novo (retomando a
+                        # sessão de upload salva) e corrige o link
+                        print(f"linha {numero}: erro no upload: {link}", file=sys.stderr)
+                        erros_upload += 1
+                        caixa.registrar(chave, montar_linha(dados, link=LINK_ERRO))
+                        continue
+                    caixa.registrar(chave, montar_linha(dados, link=link or LINK_ERRO))
+                    # Linha já registrada por uma execução anterior (upload que tinha falhado): recebe o link real
+                    caixa.atualizar_link(chave, link or LINK_ERRO)
+                    progresso.write(json.dumps({"linha": numero, "link": link}) + "\n")
+                progresso.flush()
+                os.fsync(progresso.fileno())
+                try:
+                    caixa.descarregar()
+                except Exception as e:
+                    print(f"planilha indisponível, linhas mantidas na caixa de saída: {e}", file=sys.stderr)
+
+            concluidos += len(bloco)
+            decorrido = time.perf_counter() - inicio
+            restante = (len(pendentes) - concluidos - erros_laudo) / _taxa(concluidos, decorrido)
+            print(f"[{concluidos}/{len(pendentes)}] {_taxa(concluidos, decorrido):.1f} laudos/s, faltam ~{restante:.0f} s")
+
+    if caixa is not None:
+        _esvaziar_caixa(caixa)
+
+    total = time.perf_counter() - inicio
+    print(f"concluído: {concluidos} laudos em {total:.1f} s ({_taxa(concluidos, total):.1f} laudos/s)"
+          + (f", {erros_laudo} linhas com erro na geração" if erros_laudo else ""))
+    print(f"  geração: {_taxa(concluidos, tempo_render):.1f} laudos/s com {processos} processos")
+    if not somente_gerar:
+        print(f"  upload:  {_taxa(concluidos, tempo_upload):.1f} laudos/s com paralelismo {paralelismo}"
+              f" ({erros_upload} erros)")
+        if erros_upload:
+            print(f"{erros_upload} laudos não chegaram ao Drive; rode a importação de novo para reenviá-los",
+                  file=sys.stderr)
+
+
+def _esvaziar_caixa(caixa, tentativas=6):
+    for tentativa in range(tentativas):
+        try:
+            while caixa.pendentes():
+                caixa.descarregar()
+            return
+        except Exception as e:
+            espera = 2 ** (tentativa + 1)
+            print(f"planilha indisponível ({e}); nova tentativa em {espera} s", file=sys.stderr)
+            time.sleep(espera)
+    print(f"{caixa.pendentes()} linhas continuam na caixa de saída e serão enviadas pelo app "
+          "ou na próxima importação", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("arquivo", help="CSV ou XLSX com uma RNC por linha")
+    parser.add_argument("--processos", type=int, default=None, help="processos para gerar os laudos (padrão: nº de CPUs)")
+    parser.add_argument("--paralelismo", type=int, default=PARALELISMO_UPLOAD, help="uploads simultâneos ao Drive")
+    parser.add_argument("--lote", type=int, default=50, help="linhas por bloco (geração, upload e append na planilha)")
+    parser.add_argument("--validar", action="store_true", help="só valida o arquivo, sem gerar nem enviar")
+    parser.add_argument("--somente-gerar", action="store_true", help="gera os laudos sem enviar ao Drive/planilha")
+    parser.add_argument("--pasta-saida", help="também grava os .docx gerados nesta pasta")
+    args = parser.parse_args()
+
+    if args.somente_gerar and not args.pasta_saida:
+        parser.error("--somente-gerar exige --pasta-saida")
+    importar(args.arquivo, args.processos, args.paralelismo, args.lote,
+             args.validar, args.somente_gerar, args.pasta_saida)
+
+
+if __name__ == "__main__":
+    main()
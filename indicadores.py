@@ -0,0 +1,197 @@
+import logging
+import os
+import threading
+import time
+
+import pandas as pd
+import streamlit as st
+
+from config import ARQUIVO_INDICADORES, TTL_INDICADORES
+from replica_rnc import obter_replica
+
+logger = logging.getLogger(__name__)
+
+DIMENSOES = {
+    "nao_conf": "Não Conformidade",
+    "setor_origem": "Setor de Origem",
+    "cc_origem": "Centro de Custo",
+    "turno": "Turno",
+    "fornecedor": "Fornecedor",
+    "cor_tinta": "Cor da Tinta",
+}
+METRICAS = {
+    "ocorrencias": "Ocorrências",
+    "peso": "Peso total NC",
+    "metragem": "Metragem geradora da NC",
+}
+COLUNAS_NUMERICAS = ["peso", "metragem", "qtd_pecas"]
+COLUNAS_ORIGEM = ["data_nc"] + list(DIMENSOES) + COLUNAS_NUMERICAS
+LIMITE_CONSULTAS_MEMORIZADAS = 64
+
+
+def preparar(registros):
+    """Converte tuplas (linha, *COLUNAS_ORIGEM) da réplica em colunas tipadas."""
+    df = pd.DataFrame.from_records(registros, columns=["linha"] + COLUNAS_ORIGEM)
+    # O formulário grava a data como AAAA-MM-DD; importações antigas podem ter DD/MM/AAAA
+    data = pd.to_datetime(df["data_nc"], format="ISO8601", errors="coerce")
+    faltando = data.isna()
+    if faltando.any():
+        data[faltando] = pd.to_datetime(df.loc[faltando, "data_nc"], dayfirst=True, errors="coerce")
+    df["dia"] = data.dt.normalize()
+    df = df.drop(columns="data_nc")
+    for coluna in COLUNAS_NUMERICAS:
+        df[coluna] = pd.to_numeric(df[coluna], errors="coerce").fillna(0.0)
+    for coluna in DIMENSOES:
+        df[coluna] = df[coluna].fillna("").str.strip().replace("", "(em branco)").astype("category")
+    df["ocorrencias"] = 1
+    return df.dropna(subset=["dia"])
+
+
+def _agregar(df, dimensao):
+    return (
+        df.groupby(["dia", dimensao], observed=True, as_index=False)[list(METRICAS)]
+        .sum()
+    )
+
+
+def _unir_categorias(antigo, novo):
+    for coluna in DIMENSOES:
+        categorias = antigo[coluna].cat.categories.union(novo[coluna].cat.categories)
+        antigo[coluna] = antigo[coluna].cat.set_categories(categorias)
+        novo[coluna] = novo[coluna].cat.set_categories(categorias)
+    return pd.concat([antigo, novo], ignore_index=True)
+
+
+class IndicadoresRNC:
+    """Tabela colunar (pandas) das RNCs e agregados diários por dimensão.
+
+    As linhas vêm da réplica local (replica_rnc). A cada `ttl` segundos só as
+    linhas novas são lidas, convertidas e somadas aos agregados; o resultado
+    é gravado em Parquet para o próximo processo não recomeçar do zero.
+    Consultas são memorizadas por versão dos dados.
+    """
+
+    def __init__(self, replica=None, arquivo=ARQUIVO_INDICADORES, ttl=TTL_INDICADORES):
+        self.replica = replica or obter_replica()
+        self.arquivo = arquivo
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._df = preparar([])
+        self._agregados = {dimensao: _agregar(self._df, dimensao) for dimensao in DIMENSOES}
+        self._atualizado_em = 0.0
+        self._versao = 0
+        self._consultas = {}
+        self._carregar_parquet()
+
+    @property
+    def total(self):
+        return len(self._df)
+
+    @property
+    def atualizado_em(self):
+        return self._atualizado_em
+
+    def _carregar_parquet(self):
+        if not os.path.exists(self.arquivo):
+            return
+        try:
+            df = pd.read_parquet(self.arquivo)
+        except Exception as e:
+            # Sem pyarrow ou arquivo corrompido: reconstrói a partir da réplica
+            logger.warning("Cache de indicadores ignorado (%s)", e)
+            return
+        self._df = df
+        self._agregados = {dimensao: _agregar(df, dimensao) for dimensao in DIMENSOES}
+
+    def _gravar_parquet(self):
+        try:
+            self._df.to_parquet(self.arquivo, index=False)
+        except Exception as e:
+            logger.warning("Não foi possível gravar o cache de indicadores: %s", e)
+
+    def atualizar(self, forcar=False):
+        """Incorpora as linhas novas da réplica se o TTL venceu. Devolve quantas entraram."""
+        with self._lock:
+            if not forcar and time.time() - self._atualizado_em < self.ttl:
+                return 0
+            ultima = int(self._df["linha"].max()) if len(self._df) else 0
+            novas = preparar(self.replica.linhas_apos(ultima, COLUNAS_ORIGEM))
+            self._atualizado_em = time.time()
+            if novas.empty:
+                return 0
+            self._df = _unir_categorias(self._df, novas)
+            for dimensao in DIMENSOES:
+                # Soma só os agregados das linhas novas aos já existentes
+                self._agregados[dimensao] = (
+                    pd.concat([self._agregados[dimensao], _agregar(novas, dimensao)], ignore_index=True)
+                    .groupby(["dia", dimensao], observed=True, as_index=False)[list(METRICAS)].sum()
+                )
+            self._versao += 1
+            self._consultas.clear()
+            self._gravar_parquet()
+            return len(novas)
+
+    def _memorizar(self, chave, calcular):
+        chave = (self._versao,) + chave
+        resultado = self._consultas.get(chave)
+        if resultado is None:
+            resultado = calcular()
+            if len(self._consultas) >= LIMITE_CONSULTAS_MEMORIZADAS:
+                self._consultas.pop(next(iter(self._consultas)))
+            self._consultas[chave] = resultado
+        return resultado
+
+    def _filtrar(self, inicio, fim, filtros):
+        df = self._df
+        mascara = (df["dia"] >= pd.Timestamp(inicio)) & (df["dia"] <= pd.Timestamp(fim))
+        for coluna, valores in filtros.items():
+            mascara &= df[coluna].isin(valores)
+        return df[mascara]
+
+    def pareto(self, dimensao, metrica, inicio, fim, filtros=None, limite=20):
+        """Valor por categoria em ordem decrescente, com % e % acumulado."""
+        filtros = {coluna: tuple(valores) for coluna, valores in (filtros or {}).items() if valores}
+
+        def calcular():
+            if filtros:
+                base = self._filtrar(inicio, fim, filtros)
+            else:
+                # Sem filtros, o agregado diário já responde (bem menor que a tabela)
+                base = self._agregados[dimensao]
+                base = base[(base["dia"] >= pd.Timestamp(inicio)) & (base["dia"] <= pd.Timestamp(fim))]
+            serie = base.groupby(dimensao, observed=True)[metrica].sum()
+            serie = serie[serie > 0].sort_values(ascending=False)
+            total = serie.sum()
+            resultado = pd.DataFrame({
+                dimensao: serie.index.astype(str),
+                metrica: serie.to_numpy(),
+                "percentual": (serie / total * 100).to_numpy() if total else 0.0,
+            })
+            resultado["acumulado"] = resultado["percentual"].cumsum()
+            return resultado.head(limite)
+
+        return self._memorizar(("pareto", dimensao, metrica, inicio, fim, tuple(sorted(filtros.items())), limite), calcular)
+
+    def tendencia(self, metrica, inicio, fim, filtros=None, frequencia="W-MON"):
+        """Série temporal da métrica (semanal por padrão)."""
+        filtros = {coluna: tuple(valores) for coluna, valores in (filtros or {}).items() if valores}
+
+        def calcular():
+            base = self._filtrar(inicio, fim, filtros)
+            return base.set_index("dia")[metrica].resample(frequencia, label="left", closed="left").sum()
+
+        return self._memorizar(("tendencia", metrica, inicio, fim, tuple(sorted(filtros.items())), frequencia), calcular)
+
+    def opcoes(self, dimensao):
+        return sorted(self._df[dimensao].cat.categories.astype(str))
+
+    def periodo(self):
+        if self._df.empty:
+            return None
+        return self._df["dia"].min().date(), self._df["dia"].max().date()
+
+
+@st.cache_resource(show_spinner=False)
+def obter_indicadores():
+    """Indicadores únicos por processo; `atualizar()` respeita o TTL."""
+    return IndicadoresRNC()
@@ -0,0 +1,259 @@
+"""Tempos por etapa, contadores e classificação de erros do envio de RNCs.
+
+Cada etapa medida com `medir("laudo")` vira um histograma de duração e, em
+caso de falha, um contador por tipo de erro; o resultado também sai no log
+"rnc.metricas" como uma linha JSON. Os valores ficam em memória no processo e
+são expostos no formato texto do Prometheus (`texto_prometheus()`), servido
+em /metrics quando PORTA_METRICAS está definida.
+"""
+import bisect
+import json
+import logging
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import gspread
+import requests
+import streamlit as st
+from google.auth.exceptions import RefreshError, TransportError
+from googleapiclient.errors import HttpError
+
+from config import NIVEL_LOG_METRICAS, PORTA_METRICAS
+
+logger = logging.getLogger("rnc.metricas")
+
+LIMITES_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+LIMITES_BYTES = (10e3, 50e3, 100e3, 250e3, 500e3, 1e6, 2.5e6, 5e6, 10e6, 25e6, 50e6)
+
+_AJUDA = {
+    "rnc_etapa_segundos": "Duração de cada etapa do envio",
+    "rnc_etapa_erros_total": "Falhas por etapa e tipo de erro",
+    "rnc_upload_bytes": "Tamanho dos laudos enviados ao Drive",
+    "rnc_imagem_bytes": "Tamanho das fotos antes e depois da normalização",
+    "rnc_planilha_linhas_total": "Linhas anexadas à planilha",
+}
+
+# --- Classificação de erros ---------------------------------------------------
+
+MOTIVOS_COTA = {"storageQuotaExceeded", "quotaExceeded", "dailyLimitExceeded", "teamDriveFileLimitExceeded"}
+MOTIVOS_LIMITE_TAXA = {"rateLimitExceeded", "userRateLimitExceeded", "RATE_LIMIT_EXCEEDED", "RESOURCE_EXHAUSTED"}
+
+
+def _status_e_motivos(erro):
+    """Status HTTP e motivos ("reason"/"status") estruturados da resposta de erro do Google."""
+    if isinstance(erro, HttpError):
+        detalhes = erro.error_details if isinstance(erro.error_details, list) else []
+        return erro.resp.status, {detalhe.get("reason") for detalhe in detalhes if isinstance(detalhe, dict)}
+    if isinstance(erro, gspread.exceptions.APIError):
+        corpo = erro.error if isinstance(erro.error, dict) else {}
+        motivos = {corpo.get("status")}
+        for detalhe in corpo.get("errors", []) + corpo.get("details", []):
+            if isinstance(detalhe, dict):
+                motivos.add(detalhe.get("reason"))
+        return erro.code, motivos
+    return None, set()
+
+
+def classificar_erro(erro):
+    """Tipo do erro: cota, limite_taxa (429), autenticacao, permissao, rede, servidor, requisicao ou outro."""
+    if isinstance(erro, RefreshError):
+        return "autenticacao"
+    status, motivos = _status_e_motivos(erro)
+    if status is not None:
+        if status == 401:
+            return "autenticacao"
+        if motivos & MOTIVOS_COTA:
+            return "cota"
+        if status == 429 or motivos & MOTIVOS_LIMITE_TAXA:
+            return "limite_taxa"
+        if status == 403:
+            return "permissao"
+        return "servidor" if status >= 500 else "requisicao"
+    if isinstance(erro, (requests.exceptions.ConnectionError, requests.exceptions.Timeout, TransportError,
+                         ConnectionError, socket.timeout, TimeoutError)):
+        return "rede"
+    return "outro"
+
+
+# --- Registro -----------------------------------------------------------------
+
+def _chave(nome, rotulos):
+    return nome, tuple(sorted((chave, str(valor)) for chave, valor in rotulos.items()))
+
+
+def _formatar_rotulos(rotulos, extra=()):
+    pares = list(rotulos) + list(extra)
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{chave}="{valor}"' for chave, valor in pares) + "}"
+
+
+def _formatar_limite(limite):
+    return "+Inf" if limite == float("inf") else f"{limite:g}"
+
+
+class Metricas:
+    """Contadores e histogramas em memória, seguros entre threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._contadores = {}
+        self._histogramas = {}
+
+    def contar(self, nome, valor=1, **rotulos):
+        chave = _chave(nome, rotulos)
+        with self._lock:
+            self._contadores[chave] = self._contadores.get(chave, 0) + valor
+
+    def observar(self, nome, valor, limites=LIMITES_SEGUNDOS, **rotulos):
+        chave = _chave(nome, rotulos)
+        with self._lock:
+            histograma = self._histogramas.get(chave)
+            if histograma is None:
+                histograma = self._histogramas[chave] = {
+                    "limites": tuple(limites) + (float("inf"),),
+                    "contagens": [0] * (len(limites) + 1),
+                    "soma": 0.0,
+                }
+            histograma["contagens"][bisect.bisect_left(histograma["limites"], valor)] += 1
+            histograma["soma"] += valor
+
+    @contextmanager
+    def medir(self, etapa, **rotulos):
+        """Mede o bloco como etapa `etapa`; erros são contados por tipo e repassados."""
+        inicio = time.perf_counter()
+        erro = None
+        try:
+            yield
+        except Exception as e:
+            erro = e
+            raise
+        finally:
+            duracao = time.perf_counter() - inicio
+            self.observar("rnc_etapa_segundos", duracao, etapa=etapa)
+            evento = {"etapa": etapa, "duracao_ms": round(duracao * 1000, 1), "ok": erro is None, **rotulos}
+            if erro is not None:
+                tipo = classificar_erro(erro)
+                self.contar("rnc_etapa_erros_total", etapa=etapa, tipo=tipo)
+                evento.update(erro_tipo=tipo, erro=str(erro)[:300])
+            logger.info(json.dumps(evento, ensure_ascii=False, default=str))
+
+    def texto_prometheus(self):
+        with self._lock:
+            contadores = dict(self._contadores)
+            histogramas = {chave: dict(valor, contagens=list(valor["contagens"])) for chave, valor in self._histogramas.items()}
+        linhas = []
+        nomes = sorted({nome for nome, _ in contadores} | {nome for nome, _ in histogramas})
+        for nome in nomes:
+            tipo = "counter" if any(nome_contador == nome for nome_contador, _ in contadores) else "histogram"
+            ajuda = _AJUDA.get(nome, nome)
+            linhas += [f"# HELP {nome} {ajuda}", f"# TYPE {nome} {tipo}"]
+            for (nome_contador, rotulos), valor in sorted(contadores.items()):
+                if nome_contador == nome:
+                    linhas.append(f"{nome}{_formatar_rotulos(rotulos)} {valor:g}")
+            for (nome_histograma, rotulos), histograma in sorted(histogramas.items()):
+                if nome_histograma != nome:
+                    continue
+                acumulado = 0
+                for limite, contagem in zip(histograma["limites"], histograma["contagens"]):
+                    acumulado += contagem
+                    extra = [("le", _formatar_limite(limite))]
+                    linhas.append(f"{nome}_bucket{_formatar_rotulos(rotulos, extra)} {acumulado}")
+                linhas.append(f"{nome}_sum{_formatar_rotulos(rotulos)} {histograma['soma']:g}")
+                linhas.append(f"{nome}_count{_formatar_rotulos(rotulos)} {acumulado}")
+        return "\n".join(linhas) + "\n"
+
+    def resumo_etapas(self):
+        """[{etapa, chamadas, erros, media_ms, p95_ms}] para a página de desempenho.
+
+        O p95 é estimado pelos limites do histograma (limite superior da faixa).
+        """
+        with self._lock:
+            histogramas = {
+                dict(rotulos)["etapa"]: dict(valor, contagens=list(valor["contagens"]))
+                for (nome, rotulos), valor in self._histogramas.items() if nome == "rnc_etapa_segundos"
+            }
+            erros = {}
+            for (nome, rotulos), valor in self._contadores.items():
+                if nome == "rnc_etapa_erros_total":
+                    rotulos = dict(rotulos)
+                    erros.setdefault(rotulos["etapa"], {})[rotulos["tipo"]] = valor
+        resumo = []
+        for etapa, histograma in sorted(histogramas.items()):
+            total = sum(histograma["contagens"])
+            alvo, acumulado, p95 = 0.95 * total, 0, float("inf")
+            for limite, contagem in zip(histograma["limites"], histograma["contagens"]):
+                acumulado += contagem
+                if acumulado >= alvo:
+                    p95 = limite
+                    break
+            resumo.append({
+                "etapa": etapa,
+                "chamadas": total,
+                "erros": ", ".join(f"{tipo}: {quantidade}" for tipo, quantidade in sorted(erros.get(etapa, {}).items())),
+                "media_ms": histograma["soma"] / total * 1000 if total else 0.0,
+                "p95_ms": p95 * 1000,
+            })
+        return resumo
+
+
+registro = Metricas()
+medir = registro.medir
+contar = registro.contar
+observar = registro.observar
+
+
+# --- Exposição ----------------------------------------------------------------
+
+class _HandlerMetricas(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        corpo = registro.texto_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+
+def configurar_log(nivel=NIVEL_LOG_METRICAS):
+    """Envia o log "rnc.metricas" para o stderr, uma linha JSON por etapa.
+
+    Nenhum módulo configura o logging do processo, e no nível padrão (WARNING)
+    as linhas INFO das etapas seriam descartadas.
+    """
+    if not any(getattr(handler, "_rnc_metricas", False) for handler in logger.handlers):
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        handler._rnc_metricas = True
+        logger.addHandler(handler)
+        logger.propagate = False
+    logger.setLevel(nivel.upper() if isinstance(nivel, str) else nivel)
+
+
+@st.cache_resource(show_spinner=False)
+def iniciar_servidor_metricas(porta=PORTA_METRICAS):
+    """Configura o log das etapas e serve /metrics em 127.0.0.1:`porta` (uma vez por processo).
+
+    Devolve o servidor ou None.
+    """
+    configurar_log()
+    if not porta:
+        return None
+    try:
+        servidor = ThreadingHTTPServer(("127.0.0.1", porta), _HandlerMetricas)
+    except OSError as e:
+        # Outra instância do app já ocupa a porta
+        logger.warning("Endpoint de métricas não iniciado na porta %s: %s", porta, e)
+        return None
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, name="rnc-metricas", daemon=True).start()
+    return servidor
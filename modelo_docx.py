@@ -0,0 +1,138 @@
+import copy
+import io
+import os
+import threading
+
+import streamlit as st
+from docx.shared import Mm
+from docxtpl import DocxTemplate, InlineImage
+from jinja2 import Environment
+
+from config import LARGURA_FOTO_MM, NOME_ARQUIVO_MODELO
+from metricas import medir
+
+
+class _AmbienteJinjaEmCache(Environment):
+    """Environment que compila cada XML do modelo uma única vez."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._compilados = {}
+        self._lock = threading.Lock()
+
+    def from_string(self, source, globals=None, template_class=None):
+        if globals is not None or template_class is not None:
+            return super().from_string(source, globals, template_class)
+        template = self._compilados.get(source)
+        if template is None:
+            template = super().from_string(source)
+            with self._lock:
+                self._compilados[source] = template
+        return template
+
+
+class _DocxTemplatePreCompilado(DocxTemplate):
+    """DocxTemplate que parte da cópia do documento já carregado pelo ModeloDocx
+    e do XML do corpo já limpo pelo patch_xml, em vez de reler o arquivo do disco."""
+
+    def __init__(self, modelo, documento, xml_corpo, ambiente):
+        super().__init__(modelo.caminho)
+        self.docx = documento
+        self._xml_corpo = xml_corpo
+        self._ambiente = ambiente
+
+    def init_docx(self, reload=True):
+        if not self.docx or (self.is_rendered and reload):
+            raise RuntimeError("Documento já renderizado: peça um novo ao ModeloDocx.")
+
+    def build_xml(self, context, jinja_env=None):
+        return self.render_xml_part(self._xml_corpo, self.docx._part, context, jinja_env)
+
+    def render(self, context, jinja_env=None, autoescape=False):
+        super().render(context, jinja_env or self._ambiente, autoescape)
+
+
+class ModeloDocx:
+    """Modelo .docx carregado e pré-processado uma vez por processo.
+
+    Cada `novo_documento()` devolve um DocxTemplate independente (cópia do
+    documento já parseado) pronto para InlineImage e render. Se o arquivo do
+    modelo for alterado em disco (mtime/tamanho), ele é recarregado.
+    """
+
+    def __init__(self, caminho=NOME_ARQUIVO_MODELO):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        self._assinatura = None
+        self._documento = None
+        self._xml_corpo = None
+        self._ambiente = None
+
+    def _assinatura_arquivo(self):
+        info = os.stat(self.caminho)
+        return (info.st_mtime_ns, info.st_size)
+
+    def _carregar(self, assinatura):
+        with medir("modelo_carga"):
+            with open(self.caminho, "rb") as f:
+                conteudo = f.read()
+            leitor = DocxTemplate(io.BytesIO(conteudo))
+            leitor.init_docx()
+            self._documento = leitor.docx
+            self._xml_corpo = leitor.patch_xml(leitor.get_xml())
+        self._ambiente = _AmbienteJinjaEmCache()
+        self._assinatura = assinatura
+
+    def novo_documento(self):
+        assinatura = self._assinatura_arquivo()
+        with self._lock:
+            if assinatura != self._assinatura:
+                self._carregar(assinatura)
+            documento = copy.deepcopy(self._documento)
+            return _DocxTemplatePreCompilado(self, documento, self._xml_corpo, self._ambiente)
+
+
+@st.cache_resource(show_spinner=False)
+def obter_modelo(caminho=NOME_ARQUIVO_MODELO):
+    """Modelo único por processo, reaproveitado entre reruns e sessões."""
+    return ModeloDocx(caminho)
+
+
+class _GaleriaFotos:
+    """Várias InlineImage no lugar do único {{ foto }} do modelo, uma por linha.
+
+    O XML de cada imagem só pode ser gerado durante o render (InlineImage
+    depende da parte em renderização), por isso a junção fica no __str__.
+    """
+
+    QUEBRA = '</w:t><w:br/><w:t xml:space="preserve">'
+
+    def __init__(self, fotos):
+        self.fotos = fotos
+
+    def __str__(self):
+        return self.QUEBRA.join(str(foto) for foto in self.fotos)
+
+    __html__ = __str__
+
+
+def renderizar_laudo(contexto, imagens=None, modelo=None):
+    """Gera o laudo .docx a partir do modelo em cache e devolve um BytesIO.
+
+    `imagens` é uma lista de fotos (bytes), normalmente já passadas por
+    imagens.normalizar_imagem.
+    """
+    imagens = imagens or []
+    with medir("laudo", fotos=len(imagens), bytes_fotos=sum(len(imagem) for imagem in imagens)):
+        doc = (modelo or obter_modelo()).novo_documento()
+
+        # width=Mm(LARGURA_FOTO_MM) define a largura impressa (10cm)
+        fotos = [InlineImage(doc, io.BytesIO(imagem), width=Mm(LARGURA_FOTO_MM)) for imagem in imagens]
+        contexto['foto'] = _GaleriaFotos(fotos) if fotos else ""
+
+        doc.render(contexto)
+
+        buffer = io.BytesIO()
+        doc.save(buffer)
+        buffer.seek(0)
+        return buffer
@@ -0,0 +1,126 @@
+import logging
+import sqlite3
+import threading
+from contextlib import closing
+
+import streamlit as st
+
+from config import ARQUIVO_NUMERACAO, COLUNA_NUMERO, LINHA_INICIAL_DADOS
+from conexao_google import ler_coluna
+
+logger = logging.getLogger(__name__)
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS sequencia (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    ultimo INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO sequencia (id, ultimo) VALUES (1, 0);
+CREATE TABLE IF NOT EXISTS atribuicoes (
+    chave TEXT PRIMARY KEY,
+    numero INTEGER NOT NULL UNIQUE
+);
+"""
+
+
+class NumeracaoRNC:
+    """Sequência única dos números de RNC, guardada em SQLite local.
+
+    Cada reserva é uma transação BEGIN IMMEDIATE, então sessões e processos
+    (app e importação em lote) nunca recebem o mesmo número, sem ida à
+    planilha. Na inicialização a sequência é alinhada ao maior número já
+    gravado na planilha (COLUNA_NUMERO), caso o arquivo local tenha se perdido.
+    """
+
+    def __init__(self, caminho=ARQUIVO_NUMERACAO):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        with closing(self._conectar()) as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.executescript(_ESQUEMA)
+
+    def _conectar(self):
+        return sqlite3.connect(self.caminho, timeout=30, isolation_level=None)
+
+    @property
+    def ultimo(self):
+        with closing(self._conectar()) as con:
+            return con.execute("SELECT ultimo FROM sequencia").fetchone()[0]
+
+    def reservar(self, quantidade=1):
+        """Reserva `quantidade` números consecutivos e devolve a lista."""
+        with self._lock, closing(self._conectar()) as con:
+            con.execute("BEGIN IMMEDIATE")
+            ultimo = con.execute("SELECT ultimo FROM sequencia").fetchone()[0]
+            con.execute("UPDATE sequencia SET ultimo = ?", (ultimo + quantidade,))
+            con.execute("COMMIT")
+        return list(range(ultimo + 1, ultimo + quantidade + 1))
+
+    def proximo(self):
+        return self.reservar()[0]
+
+    def devolver(self, numero):
+        """Desfaz a reserva de `numero` se ele ainda for o último da sequência.
+
+        Usado quando o envio falha antes de ser gravado. Se outro envio já
+        reservou um número depois dele, o buraco fica e é registrado no log.
+        """
+        with self._lock, closing(self._conectar()) as con:
+            con.execute("BEGIN IMMEDIATE")
+            devolvido = con.execute("UPDATE sequencia SET ultimo = ultimo - 1 WHERE ultimo = ?", (numero,)).rowcount == 1
+            con.execute("COMMIT")
+        if not devolvido:
+            logger.warning("Número de RNC %s não pôde ser devolvido: outro envio já reservou o seguinte", numero)
+        return devolvido
+
+    def atribuir(self, chaves):
+        """Número de cada chave; a mesma chave recebe sempre o mesmo número.
+
+        Usado pela importação em lote: uma linha reprocessada depois de uma
+        interrupção mantém o número, sem buracos na sequência.
+        """
+        chaves = list(dict.fromkeys(chaves))
+        with self._lock, closing(self._conectar()) as con:
+            con.execute("BEGIN IMMEDIATE")
+            numeros = {}
+            for chave in chaves:
+                registro = con.execute("SELECT numero FROM atribuicoes WHERE chave = ?", (chave,)).fetchone()
+                if registro:
+                    numeros[chave] = registro[0]
+            novas = [chave for chave in chaves if chave not in numeros]
+            if novas:
+                ultimo = con.execute("SELECT ultimo FROM sequencia").fetchone()[0]
+                for deslocamento, chave in enumerate(novas, start=1):
+                    numeros[chave] = ultimo + deslocamento
+                con.executemany("INSERT INTO atribuicoes (chave, numero) VALUES (?, ?)",
+                                [(chave, numeros[chave]) for chave in novas])
+                con.execute("UPDATE sequencia SET ultimo = ?", (ultimo + len(novas),))
+            con.execute("COMMIT")
+        return numeros
+
+    def reconciliar(self, maior_numero):
+        """Garante que a sequência continue depois de `maior_numero`. Devolve o último número."""
+        with self._lock, closing(self._conectar()) as con:
+            con.execute("BEGIN IMMEDIATE")
+            con.execute("UPDATE sequencia SET ultimo = MAX(ultimo, ?)", (int(maior_numero),))
+            ultimo = con.execute("SELECT ultimo FROM sequencia").fetchone()[0]
+            con.execute("COMMIT")
+        return ultimo
+
+    def reconciliar_planilha(self, pool=None):
+        """Lê a coluna de números da planilha (uma chamada) e reconcilia."""
+        valores = ler_coluna(COLUNA_NUMERO, pool=pool)[LINHA_INICIAL_DADOS - 1:]
+        numeros = [int(valor) for valor in (str(valor).strip() for valor in valores) if valor.isdigit()]
+        return self.reconciliar(max(numeros, default=0))
+
+
+@st.cache_resource(show_spinner=False)
+def obter_numeracao():
+    """Numeração única por processo, já alinhada à planilha quando o Google responde."""
+    numeracao = NumeracaoRNC()
+    try:
+        numeracao.reconciliar_planilha()
+    except Exception as e:
+        # Sem a planilha a sequência local continua valendo; reconcilia na próxima inicialização
+        logger.warning("Não foi possível conferir a numeração com a planilha: %s", e)
+    return numeracao
@@ -0,0 +1,123 @@
+"""Montagem e validação de um registro de RNC (formulário e importação em lote)."""
+from datetime import date, datetime
+
+from catalogos import obter_catalogos
+
+LINK_PENDENTE = "Upload pendente"
+LINK_ERRO = "Erro no Upload"
+
+# Ordem das colunas da planilha (antes da data de registro e do link)
+CAMPOS = [
+    "data_nc", "emitente", "turno", "area_id",
+    "nao_conf", "cc_origem", "setor_origem", "causa",
+    "desc_item", "cod_item", "qtd_pecas", "metragem", "peso",
+    "fornecedor", "cor_tinta", "cliente", "pedido", "op",
+    "acao", "obs",
+    "ass_lider", "ass_coord", "ass_qual", "ass_refugo", "ass_gerente",
+]
+
+# Campos escolhidos de uma lista (catalogos.json, mesma chave do campo)
+CAMPOS_CATALOGO = ("turno", "nao_conf", "cc_origem", "setor_origem", "fornecedor", "cor_tinta", "acao")
+
+CAMPOS_INTEIROS = ("qtd_pecas",)
+CAMPOS_DECIMAIS = ("metragem", "peso")
+FORMATOS_DATA = ("%d/%m/%Y", "%Y-%m-%d", "%d/%m/%y")
+
+
+def formatar_numero(numero):
+    """Número da RNC como aparece no laudo e no nome do arquivo (ex.: 00042)."""
+    return f"{int(numero):05d}" if numero not in (None, "") else ""
+
+
+def montar_contexto(dados):
+    contexto = {campo: dados.get(campo, "") for campo in CAMPOS}
+    contexto["data_nc"] = dados["data_nc"].strftime("%d/%m/%Y")
+    contexto["n_nc"] = formatar_numero(dados.get("n_nc"))
+    return contexto
+
+
+def montar_linha(dados, registrado_em=None, link=LINK_PENDENTE):
+    """Linha da planilha; o número da RNC vai depois do link e da chave (COLUNA_NUMERO)."""
+    registrado_em = registrado_em or datetime.now()
+    return [dados.get(campo, "") for campo in CAMPOS] + [registrado_em.strftime("%d/%m/%Y %H:%M:%S"), link, dados.get("n_nc", "")]
+
+
+def nome_arquivo_rnc(dados, registrado_em=None):
+    registrado_em = registrado_em or datetime.now()
+    numero = formatar_numero(dados.get("n_nc"))
+    prefixo = f"RNC {numero}" if numero else "RNC"
+    return f"{prefixo} - {registrado_em.strftime('%Y%m%d')} - {dados['cc_origem']} - {dados['nao_conf']}.docx"
+
+
+def _converter_data(valor):
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    texto = str(valor or "").strip()
+    for formato in FORMATOS_DATA:
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            pass
+    raise ValueError(f"data inválida: {texto!r}")
+
+
+def _converter_numero(valor, tipo):
+    if isinstance(valor, (int, float)):
+        return tipo(valor)
+    texto = str(valor or "").strip()
+    if not texto:
+        return tipo(0)
+    # Aceita vírgula decimal (planilhas em pt-BR): "1.234,5" -> 1234.5
+    if "," in texto:
+        texto = texto.replace(".", "").replace(",", ".")
+    numero = float(texto)
+    if tipo is int and not numero.is_integer():
+        raise ValueError(texto)
+    return tipo(numero)
+
+
+def converter_registro(bruto):
+    """Converte uma linha importada (texto) em registro e valida contra as listas de opções.
+
+    Campos de lista aceitam o rótulo ou só o código (ex.: "60" para
+    "60 TINTA CONTAMINADA"). Devolve (dados, erros); os dados só devem ser
+    usados se `erros` estiver vazio.
+    """
+    dados, erros = {}, []
+    for campo in CAMPOS:
+        valor = bruto.get(campo)
+        if isinstance(valor, str):
+            valor = valor.strip()
+        dados[campo] = "" if valor is None else valor
+
+    try:
+        dados["data_nc"] = _converter_data(bruto.get("data_nc"))
+    except ValueError as e:
+        erros.append(f"data_nc: {e}")
+
+    for campo in CAMPOS_INTEIROS + CAMPOS_DECIMAIS:
+        tipo = int if campo in CAMPOS_INTEIROS else float
+        try:
+            dados[campo] = _converter_numero(bruto.get(campo), tipo)
+            if dados[campo] < 0:
+                erros.append(f"{campo}: não pode ser negativo")
+        except (TypeError, ValueError):
+            erros.append(f"{campo}: número inválido: {bruto.get(campo)!r}")
+
+    catalogos = obter_catalogos()
+    for campo in CAMPOS_CATALOGO:
+        catalogo = catalogos[campo]
+        # Campo vazio equivale à opção em branco das listas do formulário
+        if dados[campo] == "" and catalogo.vazio is not None:
+            dados[campo] = catalogo.vazio
+        rotulo = catalogo.resolver(dados[campo])
+        if rotulo is None:
+            erros.append(f"{campo}: opção desconhecida: {dados[campo]!r}")
+        else:
+            dados[campo] = rotulo
+
+    if dados["nao_conf"].strip() == "":
+        erros.append("nao_conf: obrigatório")
+    return dados, erros
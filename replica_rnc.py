@@ -0,0 +1,188 @@
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+import gspread
+import streamlit as st
+
+from config import ARQUIVO_REPLICA, COLUNA_NUMERO, INTERVALO_SINCRONIA, LINHA_INICIAL_DADOS
+from conexao_google import obter_pool
+from metricas import medir
+from registro_rnc import CAMPOS
+
+logger = logging.getLogger(__name__)
+
+COLUNAS = CAMPOS + ["registrado_em", "link", "chave", "numero"]
+COLUNAS_BUSCA = ["nao_conf", "causa", "obs", "desc_item", "cod_item", "cliente", "pedido", "op"]
+COLUNAS_INDICE = ["op", "pedido", "cod_item", "cliente", "nao_conf", "numero"]
+
+_ESQUEMA = f"""
+CREATE TABLE IF NOT EXISTS rncs (
+    linha INTEGER PRIMARY KEY,
+    {", ".join(f"{coluna} TEXT" for coluna in COLUNAS)}
+);
+{"".join(f"CREATE INDEX IF NOT EXISTS idx_rncs_{coluna} ON rncs ({coluna} COLLATE NOCASE);" for coluna in COLUNAS_INDICE)}
+CREATE VIRTUAL TABLE IF NOT EXISTS rncs_busca USING fts5 (
+    {", ".join(COLUNAS_BUSCA)},
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+CREATE TABLE IF NOT EXISTS meta (nome TEXT PRIMARY KEY, valor TEXT);
+"""
+
+
+class ReplicaRNC:
+    """Cópia local, indexada, da aba do RNC para busca e histórico.
+
+    A sincronização é incremental: lê só as linhas após a última já copiada
+    (mais uma janela final, onde o link do Drive pode ter sido preenchido
+    depois) em blocos de `lote` linhas.
+    """
+
+    def __init__(self, caminho=ARQUIVO_REPLICA):
+        self.caminho = caminho
+        self._lock_sincronia = threading.Lock()
+        self._thread = None
+        with closing(self._conectar()) as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            existentes = {registro["name"] for registro in con.execute("PRAGMA table_info(rncs)")}
+            if existentes:
+                # Réplicas criadas antes de colunas novas na planilha
+                for coluna in COLUNAS:
+                    if coluna not in existentes:
+                        con.execute(f"ALTER TABLE rncs ADD COLUMN {coluna} TEXT")
+            con.executescript(_ESQUEMA)
+
+    def _conectar(self):
+        con = sqlite3.connect(self.caminho, timeout=30, isolation_level=None)
+        con.row_factory = sqlite3.Row
+        return con
+
+    def _meta(self, con, nome, padrao=None):
+        registro = con.execute("SELECT valor FROM meta WHERE nome = ?", (nome,)).fetchone()
+        return registro["valor"] if registro else padrao
+
+    @property
+    def ultima_linha(self):
+        with closing(self._conectar()) as con:
+            return int(self._meta(con, "ultima_linha", LINHA_INICIAL_DADOS - 1))
+
+    @property
+    def sincronizado_em(self):
+        with closing(self._conectar()) as con:
+            valor = self._meta(con, "sincronizado_em")
+        return float(valor) if valor else None
+
+    def total(self):
+        with closing(self._conectar()) as con:
+            return con.execute("SELECT COUNT(*) FROM rncs").fetchone()[0]
+
+    # --- Sincronização -------------------------------------------------------
+
+    def gravar_linhas(self, primeira_linha, valores):
+        """Grava (ou substitui) as linhas lidas da planilha a partir de `primeira_linha`."""
+        registros = []
+        for deslocamento, valores_linha in enumerate(valores):
+            valores_linha = (list(valores_linha) + [""] * len(COLUNAS))[:len(COLUNAS)]
+            if any(str(valor).strip() for valor in valores_linha):
+                registros.append((primeira_linha + deslocamento, valores_linha))
+        if not registros:
+            return 0
+        marcadores = ", ".join("?" * (len(COLUNAS) + 1))
+        indices_busca = [COLUNAS.index(coluna) for coluna in COLUNAS_BUSCA]
+        with closing(self._conectar()) as con:
+            con.execute("BEGIN")
+            con.executemany(
+                f"INSERT OR REPLACE INTO rncs (linha, {', '.join(COLUNAS)}) VALUES ({marcadores})",
+                [(linha, *valores_linha) for linha, valores_linha in registros]
+            )
+            con.executemany("DELETE FROM rncs_busca WHERE rowid = ?", [(linha,) for linha, _ in registros])
+            con.executemany(
+                f"INSERT INTO rncs_busca (rowid, {', '.join(COLUNAS_BUSCA)}) VALUES ({', '.join('?' * (len(COLUNAS_BUSCA) + 1))})",
+                [(linha, *(valores_linha[i] for i in indices_busca)) for linha, valores_linha in registros]
+            )
+            ultima = max(int(self._meta(con, "ultima_linha", 0)), registros[-1][0])
+            con.execute("INSERT OR REPLACE INTO meta VALUES ('ultima_linha', ?)", (str(ultima),))
+            con.execute("COMMIT")
+        return len(registros)
+
+    def sincronizar(self, pool=None, lote=5000, janela_revisao=200):
+        """Traz as linhas novas da planilha. Devolve quantas linhas foram gravadas."""
+        pool = pool or obter_pool()
+        ultima_coluna = gspread.utils.rowcol_to_a1(1, COLUNA_NUMERO).rstrip("1")
+        with self._lock_sincronia, medir("replica_sincronia"):
+            inicio = max(LINHA_INICIAL_DADOS, self.ultima_linha + 1 - janela_revisao)
+            gravadas = 0
+            while True:
+                intervalo = f"A{inicio}:{ultima_coluna}{inicio + lote - 1}"
+                valores = pool.executar(lambda pool: pool.aba().get_values(intervalo))
+                gravadas += self.gravar_linhas(inicio, valores)
+                if len(valores) < lote:
+                    break
+                inicio += lote
+            with closing(self._conectar()) as con:
+                con.execute("INSERT OR REPLACE INTO meta VALUES ('sincronizado_em', ?)", (str(time.time()),))
+            return gravadas
+
+    def iniciar(self, intervalo=INTERVALO_SINCRONIA):
+        """Sincroniza em segundo plano a cada `intervalo` segundos."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._laco, args=(intervalo,), name="rnc-replica", daemon=True)
+            self._thread.start()
+        return self
+
+    def _laco(self, intervalo):
+        while True:
+            try:
+                self.sincronizar()
+            except Exception as e:
+                logger.warning("Falha ao sincronizar a réplica da planilha: %s", e)
+            time.sleep(intervalo)
+
+    # --- Consulta ------------------------------------------------------------
+
+    def linhas_apos(self, linha, colunas):
+        """Tuplas (linha, *colunas) das RNCs gravadas depois de `linha`, em ordem."""
+        desconhecidas = set(colunas) - set(COLUNAS)
+        if desconhecidas:
+            raise ValueError(f"Coluna desconhecida: {', '.join(sorted(desconhecidas))}")
+        with closing(self._conectar()) as con:
+            con.row_factory = None
+            return con.execute(
+                f"SELECT linha, {', '.join(colunas)} FROM rncs WHERE linha > ? ORDER BY linha", (linha,)
+            ).fetchall()
+
+    def buscar(self, texto, limite=50):
+        """Busca textual (sem acento, por prefixo) em causa, observações, itens etc."""
+        termos = [termo.replace('"', '') for termo in texto.split() if termo.replace('"', '')]
+        if not termos:
+            return []
+        consulta = " AND ".join(f'"{termo}"*' for termo in termos)
+        with closing(self._conectar()) as con:
+            return [dict(registro) for registro in con.execute(
+                "SELECT rncs.* FROM rncs_busca JOIN rncs ON rncs.linha = rncs_busca.rowid "
+                "WHERE rncs_busca MATCH ? ORDER BY rank LIMIT ?",
+                (consulta, limite)
+            )]
+
+    def historico(self, limite=10, **filtros):
+        """RNCs anteriores com os mesmos valores (ex.: cod_item="123", op="OP-1"), mais recentes primeiro."""
+        filtros = {coluna: str(valor).strip() for coluna, valor in filtros.items() if str(valor or "").strip()}
+        if not filtros:
+            return []
+        desconhecidas = set(filtros) - set(COLUNAS_INDICE)
+        if desconhecidas:
+            raise ValueError(f"Filtro sem índice: {', '.join(sorted(desconhecidas))}")
+        condicoes = " OR ".join(f"{coluna} = ? COLLATE NOCASE" for coluna in filtros)
+        with closing(self._conectar()) as con:
+            return [dict(registro) for registro in con.execute(
+                f"SELECT * FROM rncs WHERE {condicoes} ORDER BY linha DESC LIMIT ?",
+                (*filtros.values(), limite)
+            )]
+
+
+@st.cache_resource(show_spinner=False)
+def obter_replica():
+    """Réplica única por processo; a sincronização roda em segundo plano."""
+    return ReplicaRNC().iniciar()
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Módulos do app (raiz) e os servidores falsos do Google (benchmarks/google_falso.py)
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [RAIZ, os.path.join(RAIZ, "benchmarks")]
@@ -0,0 +1,88 @@
+"""Testes da caixa de saída da planilha contra o Sheets falso local (benchmarks/google_falso.py).
+
+Uso (na raiz do repositório):
+    python -m pytest tests/test_caixa_saida.py
+"""
+import gspread
+import pytest
+
+from caixa_saida import ENVIADO, PENDENTE, REJEITADO, TENTATIVAS_RECUSA, CaixaSaida
+from config import COLUNA_CHAVE, COLUNA_LINK
+from google_falso import LIMITE_CELULA, PoolLocal, SheetsFalso
+
+
+@pytest.fixture
+def sheets():
+    servidor = SheetsFalso().iniciar()
+    yield servidor
+    servidor.parar()
+
+
+@pytest.fixture
+def caixa(sheets, tmp_path):
+    # Sem o descarregador em segundo plano: cada ciclo é chamado pelo teste
+    return CaixaSaida(str(tmp_path / "caixa.db"), intervalo_minimo=0, pool=PoolLocal(sheets=sheets))
+
+
+def _chaves(sheets):
+    return [linha[COLUNA_CHAVE - 1] for linha in sheets.linhas[1:]]
+
+
+def test_falha_ambigua_nao_duplica_a_linha(caixa, sheets):
+    caixa.registrar("rnc-1", ["01/01/2026", "Peça fora de medida"])
+    caixa.registrar("rnc-2", ["02/01/2026", "Risco na pintura"])
+    sheets.respostas_perdidas = 1
+
+    # O append foi aplicado, mas o cliente só recebeu o 503
+    with pytest.raises(gspread.exceptions.APIError):
+        caixa.descarregar()
+    assert caixa.situacao("rnc-1")["estado"] == PENDENTE
+
+    # A nova tentativa lê a coluna de chaves e não anexa de novo
+    assert caixa.descarregar() == 0
+    assert sheets.contadores["appends"] == 1
+    assert _chaves(sheets) == ["rnc-1", "rnc-2"]
+    assert caixa.situacao("rnc-1") == {
+        "estado": ENVIADO, "linha_planilha": 2, "link_pendente": None, "tentativas": 1, "ultimo_erro": None,
+    }
+    assert caixa.situacao("rnc-2")["linha_planilha"] == 3
+    assert caixa.pendentes() == 0
+
+
+def test_celula_acima_do_limite_nao_trava_o_lote(caixa, sheets):
+    caixa.registrar("rnc-1", ["01/01/2026", "Peça fora de medida"])
+    caixa.registrar("rnc-2", ["02/01/2026", "x" * (LIMITE_CELULA + 1)])
+    caixa.registrar("rnc-3", ["03/01/2026", "Risco na pintura"])
+
+    caixa.descarregar()
+
+    assert _chaves(sheets) == ["rnc-1", "rnc-3"]
+    assert caixa.situacao("rnc-3")["estado"] == ENVIADO
+    recusada = caixa.situacao("rnc-2")
+    assert recusada["estado"] == PENDENTE and recusada["tentativas"] == 1
+
+    # Recusada de novo até TENTATIVAS_RECUSA, e então deixa de ser reenviada
+    for _ in range(TENTATIVAS_RECUSA - 1):
+        caixa.descarregar()
+    assert caixa.situacao("rnc-2")["estado"] == REJEITADO
+    assert "maximum" in caixa.situacao("rnc-2")["ultimo_erro"]
+    assert caixa.pendentes() == 0
+    assert _chaves(sheets) == ["rnc-1", "rnc-3"]
+
+
+def test_link_chega_depois_da_linha_enviada(caixa, sheets):
+    caixa.registrar("rnc-1", ["01/01/2026", "Peça fora de medida"])
+    caixa.descarregar()
+    assert sheets.linhas[1][COLUNA_LINK - 1] == ""
+
+    caixa.atualizar_link("rnc-1", "https://drive.google.com/file/d/laudo")
+    assert caixa.situacao("rnc-1")["link_pendente"] == "https://drive.google.com/file/d/laudo"
+    assert caixa.pendentes() == 1
+
+    caixa.descarregar()
+
+    assert sheets.linhas[1][COLUNA_LINK - 1] == "https://drive.google.com/file/d/laudo"
+    assert sheets.contadores["batch_updates"] == 1
+    assert sheets.contadores["appends"] == 1
+    assert caixa.situacao("rnc-1")["link_pendente"] is None
+    assert caixa.pendentes() == 0
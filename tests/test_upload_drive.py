@@ -0,0 +1,98 @@
+"""Testes do upload_drive contra o Drive falso local (benchmarks/google_falso.py).
+
+Uso (na raiz do repositório):
+    python -m pytest tests/test_upload_drive.py
+"""
+import io
+import os
+
+import httplib2
+import pytest
+
+import upload_drive
+from google_falso import DriveFalso, PoolLocal
+
+MB = 1024 * 1024
+TAMANHO_GRANDE = 12 * MB
+CHUNK = 1 * MB
+
+
+@pytest.fixture
+def drive():
+    servidor = DriveFalso().iniciar()
+    yield servidor
+    servidor.parar()
+
+
+@pytest.fixture
+def sessoes(tmp_path):
+    return upload_drive.SessoesUpload(str(tmp_path))
+
+
+@pytest.fixture
+def sem_novas_tentativas(monkeypatch):
+    # A primeira queda de conexão sobe como exceção, como se o processo tivesse caído
+    monkeypatch.setattr(upload_drive, "TENTATIVAS_CHUNK", 0)
+
+
+def _arquivo(tamanho):
+    return io.BytesIO(os.urandom(tamanho))
+
+
+def _enviar(drive, sessoes, arquivo, **opcoes):
+    return upload_drive.enviar_arquivo(
+        arquivo, "laudo.docx", pool=PoolLocal(drive=drive), sessoes=sessoes, tamanho_chunk=CHUNK, **opcoes
+    )
+
+
+def _interromper(drive, sessoes, arquivo, chave):
+    drive.cortar_conexao_apos = 6 * MB
+    with pytest.raises((OSError, httplib2.HttpLib2Error)):
+        _enviar(drive, sessoes, arquivo, chave=chave)
+    drive.cortar_conexao_apos = None
+    drive.contadores.clear()
+
+
+def test_arquivo_pequeno_usa_uma_requisicao_multipart(drive, sessoes):
+    link = _enviar(drive, sessoes, _arquivo(200 * 1024), chave="pequeno", limite_simples=5 * MB)
+
+    assert link.startswith(drive.url)
+    assert drive.contadores["multipart"] == 1
+    assert "sessoes_retomaveis" not in drive.contadores and "partes" not in drive.contadores
+    assert sessoes.obter("pequeno") is None
+
+
+def test_retomada_envia_so_o_restante(drive, sessoes, sem_novas_tentativas):
+    arquivo = _arquivo(TAMANHO_GRANDE)
+    _interromper(drive, sessoes, arquivo, "queda")
+    assert sessoes.obter("queda")["tamanho"] == TAMANHO_GRANDE
+
+    link = _enviar(drive, sessoes, arquivo, chave="queda", limite_simples=0)
+
+    assert link.startswith(drive.url)
+    assert drive.contadores["bytes_recebidos"] == TAMANHO_GRANDE - 6 * MB
+    assert drive.contadores["consultas_status"] == 1
+    assert "sessoes_retomaveis" not in drive.contadores
+    assert list(drive.arquivos.values()) == [TAMANHO_GRANDE]
+
+
+def test_sessao_removida_ao_concluir(drive, sessoes):
+    _enviar(drive, sessoes, _arquivo(3 * MB), chave="completo", limite_simples=0)
+
+    assert sessoes.obter("completo") is None
+    assert os.listdir(sessoes.pasta) == []
+
+
+def test_sessao_expirada_recomeca_e_salva_a_nova(drive, sessoes, sem_novas_tentativas):
+    arquivo = _arquivo(TAMANHO_GRANDE)
+    expirada = f"{drive.url}upload/drive/v3/files?uploadType=resumable&upload_id=expirada"
+    sessoes.salvar("expirada", expirada, TAMANHO_GRANDE)
+
+    # O Drive responde 404 para a sessão antiga; o envio recomeça e cai de novo em 6 MB
+    _interromper(drive, sessoes, arquivo, "expirada")
+    nova = sessoes.obter("expirada")
+    assert nova is not None and nova["uri"] != expirada
+
+    _enviar(drive, sessoes, arquivo, chave="expirada", limite_simples=0)
+    assert drive.contadores["bytes_recebidos"] == TAMANHO_GRANDE - 6 * MB
+    assert sessoes.obter("expirada") is None
@@ -0,0 +1,166 @@
+import io
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httplib2
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaIoBaseUpload
+
+from config import (
+    ID_PASTA_DRIVE, LIMITE_UPLOAD_SIMPLES, PARALELISMO_UPLOAD, PASTA_SESSOES_UPLOAD, TAMANHO_CHUNK_UPLOAD,
+)
+from conexao_google import MIME_DOCX, obter_pool
+from metricas import LIMITES_BYTES, medir, observar
+
+logger = logging.getLogger(__name__)
+
+TENTATIVAS_CHUNK = 5
+
+
+class SessoesUpload:
+    """Guarda em disco a URI de cada upload retomável em andamento.
+
+    Se o processo cair no meio do envio, a próxima tentativa com a mesma
+    chave consulta o Drive e continua do último byte confirmado.
+    """
+
+    def __init__(self, pasta=PASTA_SESSOES_UPLOAD):
+        self.pasta = pasta
+        os.makedirs(pasta, exist_ok=True)
+
+    def _caminho(self, chave):
+        return os.path.join(self.pasta, f"{chave}.json")
+
+    def obter(self, chave):
+        try:
+            with open(self._caminho(chave), encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def salvar(self, chave, uri, tamanho):
+        temporario = self._caminho(chave) + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump({"uri": uri, "tamanho": tamanho}, f)
+        os.replace(temporario, self._caminho(chave))
+
+    def remover(self, chave):
+        try:
+            os.remove(self._caminho(chave))
+        except FileNotFoundError:
+            pass
+
+
+def _tamanho(buffer):
+    buffer.seek(0, io.SEEK_END)
+    tamanho = buffer.tell()
+    buffer.seek(0)
+    return tamanho
+
+
+def _metadados(nome_arquivo):
+    return {
+        'name': nome_arquivo,
+        'parents': [ID_PASTA_DRIVE] # Certifique-se que este ID é de uma pasta em um DRIVE COMPARTILHADO
+    }
+
+
+def _criar(pool, nome_arquivo, media):
+    # supportsAllDrives=True permite salvar em Drives Compartilhados (de Equipe)
+    return pool.servico_drive().files().create(
+        body=_metadados(nome_arquivo),
+        media_body=media,
+        fields='id, webViewLink',
+        supportsAllDrives=True
+    )
+
+
+def _enviar_simples(pool, buffer, nome_arquivo):
+    buffer.seek(0)
+    media = MediaIoBaseUpload(buffer, mimetype=MIME_DOCX, resumable=False)
+    return _criar(pool, nome_arquivo, media).execute(num_retries=3)
+
+
+def _enviar_retomavel(pool, buffer, nome_arquivo, tamanho, chave, sessoes, tamanho_chunk):
+    buffer.seek(0)
+    media = MediaIoBaseUpload(buffer, mimetype=MIME_DOCX, chunksize=tamanho_chunk, resumable=True)
+    requisicao = _criar(pool, nome_arquivo, media)
+
+    sessao = sessoes.obter(chave) if chave else None
+    retomando = bool(sessao and sessao["tamanho"] == tamanho)
+    if retomando:
+        # O googleapiclient não tem API pública para retomar uma sessão salva em um
+        # HttpRequest novo. Com _in_error_state, o próximo next_chunk manda um PUT
+        # vazio "Content-Range: bytes */<tamanho>" e continua do último byte que o
+        # Drive confirmou (o mesmo caminho que ele usa após uma queda de conexão).
+        requisicao.resumable_uri = sessao["uri"]
+        requisicao._in_error_state = True
+
+    resposta, falhas = None, 0
+    while resposta is None:
+        try:
+            _, resposta = requisicao.next_chunk(num_retries=3)
+            falhas = 0
+        except HttpError as e:
+            if retomando and e.resp.status in (404, 410):
+                # Sessão expirada no Drive (dura cerca de uma semana): recomeça do zero,
+                # ainda com a chave, para a sessão nova também ser salva
+                sessoes.remover(chave)
+                return _enviar_retomavel(pool, buffer, nome_arquivo, tamanho, chave, sessoes, tamanho_chunk)
+            raise
+        except (OSError, httplib2.HttpLib2Error) as e:
+            # Conexão caiu no meio da parte: o next_chunk já marcou estado de erro
+            falhas += 1
+            if falhas > TENTATIVAS_CHUNK:
+                raise
+            logger.warning("Upload de %s interrompido (%s); retomando em %d s", nome_arquivo, e, 2 ** falhas)
+            time.sleep(2 ** falhas)
+        if chave and resposta is None and not retomando and requisicao.resumable_uri:
+            sessoes.salvar(chave, requisicao.resumable_uri, tamanho)
+            retomando = True
+
+    if chave:
+        sessoes.remover(chave)
+    return resposta
+
+
+def enviar_arquivo(buffer_arquivo, nome_arquivo, chave=None, pool=None, sessoes=None,
+                   limite_simples=LIMITE_UPLOAD_SIMPLES, tamanho_chunk=TAMANHO_CHUNK_UPLOAD):
+    """Envia o arquivo para a pasta do Drive e devolve o webViewLink.
+
+    Até `limite_simples` bytes usa upload multipart (uma única requisição);
+    acima disso, upload retomável em partes de `tamanho_chunk`. Com `chave`,
+    a sessão retomável é gravada em disco e reaproveitada em nova tentativa.
+    """
+    pool = pool or obter_pool()
+    tamanho = _tamanho(buffer_arquivo)
+    modo = "simples" if tamanho <= limite_simples else "retomavel"
+    observar("rnc_upload_bytes", tamanho, LIMITES_BYTES, modo=modo)
+    with medir("upload_drive", modo=modo, bytes=tamanho):
+        if modo == "simples":
+            arquivo = pool.executar(lambda pool: _enviar_simples(pool, buffer_arquivo, nome_arquivo))
+        else:
+            sessoes = sessoes or SessoesUpload()
+            arquivo = pool.executar(
+                lambda pool: _enviar_retomavel(pool, buffer_arquivo, nome_arquivo, tamanho, chave, sessoes, tamanho_chunk)
+            )
+    return arquivo.get('webViewLink')
+
+
+def enviar_varios(arquivos, paralelismo=PARALELISMO_UPLOAD, **opcoes):
+    """Envia [(buffer, nome, chave), ...] com no máximo `paralelismo` uploads simultâneos.
+
+    Devolve, na mesma ordem, o link de cada arquivo ou a exceção do envio.
+    """
+    def enviar(item):
+        buffer, nome, chave = item
+        try:
+            return enviar_arquivo(buffer, nome, chave=chave, **opcoes)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=paralelismo, thread_name_prefix="rnc-upload") as executor:
+        return list(executor.map(enviar, arquivos))